@@ -2,114 +2,407 @@
 """
 Generate social media preview images for v9n consulting and Just Do AI
 Size: 1200x630px (Open Graph standard)
+
+Cards come from a JSON manifest (default: social-cards.json next to this
+script). Each entry names a theme plus its title, subtitle, brand and
+output path. Outputs are relative to the output root: --output-root, else
+the manifest's "output_root" (relative to the manifest), else the
+manifest's own directory.
 """
 
-from PIL import Image, ImageDraw, ImageFont
-import textwrap
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import hashlib
+import json
+import math
+import os
+import sys
+from PIL import Image, ImageColor, ImageDraw, ImageFont
 
-def create_v9n_preview():
-    """Create v9n consulting social preview image"""
-    # Create image with gradient background
-    img = Image.new('RGB', (1200, 630), color='#f8f9fa')
-    draw = ImageDraw.Draw(img)
+CARD_SIZE = (1200, 630)
+
+FONT_BOLD = "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"
+FONT_REGULAR = "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
+
+JPEG_SETTINGS = {'quality': 95, 'optimize': True}
+
+# Outputs carry a hash of their inputs in the JPEG comment; bump
+# RENDER_VERSION whenever render_card() draws differently
+RENDER_VERSION = 2
+CACHE_TAG = 'social-card sha256:'
+
+DEFAULT_MANIFEST = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'social-cards.json')
+
+# Size glyph advances are measured at; other sizes scale from it
+REFERENCE_SIZE = 100
+
+# Layout and colours per theme. Titles are fitted into title_box
+# (x, y, width, height) at up to title_size, shrinking to title_min_size;
+# title lines take title_colors in turn.
+THEMES = {
+    'v9n': {
+        'background': ((0, '#f8f9fa'), (1, '#e9ecef')),
+        'title_size': 80,
+        'title_min_size': 36,
+        'title_box': (60, 180, 1080, 180),
+        'title_line_height': 90,
+        'title_colors': ('#1a1a1a', '#2a2a2a'),
+        'subtitle_size': 32,
+        'subtitle_y': 390,
+        'subtitle_color': '#666666',
+        'brand': 'v9n consulting',
+        'brand_size': 36,
+        'brand_xy': (60, 550),
+        'brand_color': '#1a1a1a',
+    },
+    'justdoai': {
+        'background': ((0, '#0a0a0a'), (1, '#1a1a1a')),
+        'title_size': 70,
+        'title_min_size': 36,
+        'title_box': (60, 200, 1080, 160),
+        'title_line_height': 80,
+        'title_colors': ('#ffffff', '#e8e8e8'),
+        'subtitle_size': 28,
+        'subtitle_y': 390,
+        'subtitle_color': '#888888',
+        'brand': 'Just Do AI',
+        'brand_size': 36,
+        'brand_xy': (60, 550),
+        'brand_color': '#ffffff',
+    },
+}
+
+@lru_cache(maxsize=None)
+def gradient_line(length, stops):
+    """Render one row of gradient pixels, cached so cards sharing a theme reuse it."""
+    stops = sorted((position, ImageColor.getrgb(colour)[:3]) for position, colour in stops)
+    if len(stops) == 1:
+        stops = stops * 2
+    pixels = bytearray()
+    k = 0
+    for i in range(length):
+        t = i / length
+        while k < len(stops) - 2 and t > stops[k + 1][0]:
+            k += 1
+        (p0, (r0, g0, b0)), (p1, (r1, g1, b1)) = stops[k], stops[k + 1]
+        f = min(max((t - p0) / (p1 - p0), 0), 1) if p1 > p0 else 0
+        pixels += bytes((int(r0 + (r1 - r0) * f), int(g0 + (g1 - g0) * f), int(b0 + (b1 - b0) * f)))
+    return Image.frombytes('RGB', (length, 1), bytes(pixels))
+
+def gradient(size, stops, angle=180):
+    """Render a linear gradient background in one bulk operation.
+
+    stops is a list of (position, colour) pairs with positions from 0 to 1.
+    angle follows CSS: 180 runs top to bottom, 90 left to right.
+    """
+    width, height = size
+    dx = round(math.sin(math.radians(angle)), 12)
+    dy = round(-math.cos(math.radians(angle)), 12)
+    length = max(1, math.ceil(abs(width * dx) + abs(height * dy)))
+    line = gradient_line(length, tuple(stops))
+
+    if dx == 0 or dy == 0:
+        # Axis-aligned: stretch the line across the other axis
+        if dy:
+            line = line.transpose(Image.TRANSPOSE)
+        if dx < 0:
+            line = line.transpose(Image.FLIP_LEFT_RIGHT)
+        elif dy < 0:
+            line = line.transpose(Image.FLIP_TOP_BOTTOM)
+        return line.resize(size, Image.NEAREST)
+
+    # Project every pixel onto the line along the gradient direction
+    offset = length / 2 - dx * width / 2 - dy * height / 2
+    return line.transform(size, Image.AFFINE, (dx, dy, offset, 0, 0, 0), Image.NEAREST)
+
+@lru_cache(maxsize=None)
+def load_font(path, size):
+    """Load a font once per (path, size), falling back to Pillow's default."""
+    try:
+        return ImageFont.truetype(path, size)
+    except OSError:
+        return ImageFont.load_default()
+
+# Scratch canvas for measuring text outside of any card
+MEASURE = ImageDraw.Draw(Image.new('RGB', (1, 1)))
+
+@lru_cache(maxsize=None)
+def text_width(text, font):
+    """Width of text set in font, cached across cards."""
+    bbox = MEASURE.textbbox((0, 0), text, font=font)
+    return bbox[2] - bbox[0]
+
+@lru_cache(maxsize=None)
+def text_advance(path, text):
+    """Advance of text at REFERENCE_SIZE from cached per-glyph advances.
+
+    Ignores kerning, which DejaVu barely uses; fit_text() checks the
+    real width of its final choice.
+    """
+    return sum(glyph_advance(path, char) for char in text)
+
+@lru_cache(maxsize=None)
+def glyph_advance(path, char):
+    """Advance of one glyph at REFERENCE_SIZE."""
+    return load_font(path, REFERENCE_SIZE).getlength(char)
+
+def wrap_words(path, paragraphs, size, max_width):
+    """Greedy line breaks at size; paragraphs always start a new line."""
+    scale = size / REFERENCE_SIZE
+    space = text_advance(path, ' ') * scale
+    lines = []
+    for paragraph in paragraphs:
+        line, line_width = [], 0
+        for word in paragraph.split():
+            word_width = text_advance(path, word) * scale
+            if line and line_width + space + word_width > max_width:
+                lines.append(' '.join(line))
+                line, line_width = [], 0
+            line_width += (space if line else 0) + word_width
+            line.append(word)
+        lines.append(' '.join(line))
+    return lines, max((text_advance(path, line) for line in lines), default=0) * scale
+
+@lru_cache(maxsize=None)
+def fit_text(paragraphs, path, box_width, box_height, max_size, min_size, line_ratio):
+    """Pick the largest font size and line breaks that fit the text in a box.
 
-    # Add subtle gradient effect by drawing rectangles with varying opacity
-    for i in range(630):
-        # Calculate color gradient from #f8f9fa to #e9ecef
-        r = int(248 - (248 - 233) * (i / 630))
-        g = int(249 - (249 - 236) * (i / 630))
-        b = int(250 - (250 - 239) * (i / 630))
-        draw.rectangle([(0, i), (1200, i+1)], fill=(r, g, b))
+    Returns (size, lines). Falls back to min_size when nothing fits.
+    """
+    def fits(size):
+        lines, widest = wrap_words(path, paragraphs, size, box_width)
+        return widest <= box_width and len(lines) * round(size * line_ratio) <= box_height
 
-    # Try to use system fonts, fall back to default
+    # Binary search on the estimated widths, then step down in the rare
+    # case the rendered width still overflows
+    low, high = min_size, max_size
+    while low < high:
+        mid = (low + high + 1) // 2
+        if fits(mid):
+            low = mid
+        else:
+            high = mid - 1
+    for size in range(low, min_size - 1, -1):
+        lines, _ = wrap_words(path, paragraphs, size, box_width)
+        font = load_font(path, size)
+        if all(text_width(line, font) <= box_width for line in lines):
+            return size, lines
+    return min_size, wrap_words(path, paragraphs, min_size, box_width)[0]
+
+def load_cards(manifest_path, output_root=None):
+    """Read the card list from a manifest, checking each entry."""
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    cards = manifest['cards']
+    if output_root is None:
+        output_root = os.path.join(os.path.dirname(os.path.abspath(manifest_path)),
+                                   manifest.get('output_root', '.'))
+    for card in cards:
+        theme = card.setdefault('theme', 'v9n')
+        if theme not in THEMES:
+            raise ValueError(f"card {card.get('output')!r} has unknown theme {theme!r} "
+                             f"(choose from {', '.join(THEMES)})")
+        if 'title' not in card or 'output' not in card:
+            raise ValueError(f"card {card!r} needs a title and an output")
+        if not any(line.strip() for line in title_lines(card)):
+            raise ValueError(f"card {card['output']!r} has an empty title")
+        card.setdefault('name', os.path.splitext(os.path.basename(card['output']))[0])
+        card['path'] = os.path.normpath(os.path.join(output_root, card['output']))
+    return cards
+
+def select_cards(cards, names):
+    """Keep the cards matching any of names (card name or output path)."""
+    known = {card['name'] for card in cards} | {card['output'] for card in cards}
+    unknown = [name for name in names if name not in known]
+    if unknown:
+        raise ValueError(f"no card named {', '.join(unknown)} "
+                         f"(choose from {', '.join(card['name'] for card in cards)})")
+    return [card for card in cards if card['name'] in names or card['output'] in names]
+
+def title_lines(card):
+    """A title is a list of lines or a string with newlines; long lines wrap further."""
+    title = card['title']
+    return title if isinstance(title, list) else title.split('\n')
+
+@lru_cache(maxsize=None)
+def file_digest(path):
+    """sha256 of a file's contents, or None when it is missing."""
     try:
-        title_font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 80)
-        subtitle_font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 32)
-        brand_font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 36)
-    except:
-        # Fallback to default font
-        title_font = ImageFont.load_default()
-        subtitle_font = ImageFont.load_default()
-        brand_font = ImageFont.load_default()
-
-    # Draw title
-    title_line1 = "Technology Strategies"
-    title_line2 = "for Small Business"
-
-    # Center the title
-    bbox1 = draw.textbbox((0, 0), title_line1, font=title_font)
-    title1_width = bbox1[2] - bbox1[0]
-    bbox2 = draw.textbbox((0, 0), title_line2, font=title_font)
-    title2_width = bbox2[2] - bbox2[0]
-
-    draw.text(((1200 - title1_width) // 2, 180), title_line1, fill='#1a1a1a', font=title_font)
-    draw.text(((1200 - title2_width) // 2, 270), title_line2, fill='#2a2a2a', font=title_font)
-
-    # Draw subtitle
-    subtitle = "Independent consulting without the enterprise complexity"
-    bbox_sub = draw.textbbox((0, 0), subtitle, font=subtitle_font)
-    subtitle_width = bbox_sub[2] - bbox_sub[0]
-    draw.text(((1200 - subtitle_width) // 2, 390), subtitle, fill='#666666', font=subtitle_font)
-
-    # Draw brand name
-    brand = "v9n consulting"
-    draw.text((60, 550), brand, fill='#1a1a1a', font=brand_font)
-
-    # Save
-    img.save('/home/trick/src/github.com/trickv/v9n-consulting/images/v9n-social-preview.jpg', 'JPEG', quality=95, optimize=True)
-    print("✓ Created v9n-social-preview.jpg")
-
-def create_justdoai_preview():
-    """Create Just Do AI social preview image"""
-    # Create image with dark gradient background
-    img = Image.new('RGB', (1200, 630), color='#0a0a0a')
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+def card_key(card):
+    """Hash everything that decides a card's bytes: text, theme, fonts, size and encoder settings."""
+    theme = THEMES[card['theme']]
+    inputs = {
+        'title': title_lines(card),
+        'subtitle': card.get('subtitle'),
+        'brand': card.get('brand', theme['brand']),
+        'theme': theme,
+        'fonts': {path: file_digest(path) for path in (FONT_BOLD, FONT_REGULAR)},
+        'size': CARD_SIZE,
+        'jpeg': JPEG_SETTINGS,
+        'version': RENDER_VERSION,
+    }
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+
+def is_cached(path, key):
+    """Check whether path already holds a render with this key (reads only the header)."""
+    try:
+        with Image.open(path) as img:
+            return img.info.get('comment') == (CACHE_TAG + key).encode()
+    except OSError:
+        return False
+
+def render_card(card):
+    """Draw one card from its manifest entry."""
+    theme = THEMES[card['theme']]
+    img = gradient(CARD_SIZE, theme['background'])
     draw = ImageDraw.Draw(img)
+    width = CARD_SIZE[0]
+
+    # Fit the title into its box, centring the lines there
+    x, y, box_width, box_height = theme['title_box']
+    line_ratio = theme['title_line_height'] / theme['title_size']
+    size, lines = fit_text(tuple(title_lines(card)), FONT_BOLD, box_width, box_height,
+                           theme['title_size'], theme['title_min_size'], line_ratio)
+    title_font = load_font(FONT_BOLD, size)
+    line_height = round(size * line_ratio)
+    top = y + (box_height - len(lines) * line_height) // 2
+    colors = theme['title_colors']
+    for i, line in enumerate(lines):
+        draw.text((x + (box_width - text_width(line, title_font)) // 2, top + i * line_height), line,
+                  fill=colors[min(i, len(colors) - 1)], font=title_font)
+
+    subtitle = card.get('subtitle')
+    if subtitle:
+        subtitle_font = load_font(FONT_REGULAR, theme['subtitle_size'])
+        draw.text(((width - text_width(subtitle, subtitle_font)) // 2, theme['subtitle_y']), subtitle,
+                  fill=theme['subtitle_color'], font=subtitle_font)
+
+    brand_font = load_font(FONT_BOLD, theme['brand_size'])
+    draw.text(theme['brand_xy'], card.get('brand', theme['brand']), fill=theme['brand_color'], font=brand_font)
+    return img
 
-    # Add gradient effect
-    for i in range(630):
-        # Calculate color gradient from #0a0a0a to #1a1a1a
-        brightness = int(10 + (26 - 10) * (i / 630))
-        draw.rectangle([(0, i), (1200, i+1)], fill=(brightness, brightness, brightness))
+def card_status(card):
+    """Classify a card's output as 'current', 'stale' or 'missing'."""
+    if not os.path.exists(card['path']):
+        return 'missing'
+    return 'current' if is_cached(card['path'], card_key(card)) else 'stale'
 
-    # Try to use system fonts
+def build_card(card, force=False):
+    """Render a card and save it as JPEG, unless its output is already current.
+
+    Returns True when the card was rendered.
+    """
+    key = card_key(card)
+    if not force and is_cached(card['path'], key):
+        return False
+    img = render_card(card)
+    os.makedirs(os.path.dirname(card['path']), exist_ok=True)
+
+    # Write next to the output and swap it in, so a failed save never
+    # leaves a truncated card behind
+    tmp_path = os.path.join(os.path.dirname(card['path']), '.' + os.path.basename(card['path']) + '.tmp')
     try:
-        title_font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 70)
-        subtitle_font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 28)
-        brand_font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 36)
-    except:
-        title_font = ImageFont.load_default()
-        subtitle_font = ImageFont.load_default()
-        brand_font = ImageFont.load_default()
-
-    # Draw title
-    title_line1 = "Navigate the AI Revolution"
-    title_line2 = "with Confidence"
-
-    bbox1 = draw.textbbox((0, 0), title_line1, font=title_font)
-    title1_width = bbox1[2] - bbox1[0]
-    bbox2 = draw.textbbox((0, 0), title_line2, font=title_font)
-    title2_width = bbox2[2] - bbox2[0]
-
-    draw.text(((1200 - title1_width) // 2, 200), title_line1, fill='#ffffff', font=title_font)
-    draw.text(((1200 - title2_width) // 2, 280), title_line2, fill='#e8e8e8', font=title_font)
-
-    # Draw subtitle
-    subtitle = "Practical AI guidance for small businesses cutting through the hype"
-    bbox_sub = draw.textbbox((0, 0), subtitle, font=subtitle_font)
-    subtitle_width = bbox_sub[2] - bbox_sub[0]
-    draw.text(((1200 - subtitle_width) // 2, 390), subtitle, fill='#888888', font=subtitle_font)
-
-    # Draw brand name
-    brand = "Just Do AI"
-    draw.text((60, 550), brand, fill='#ffffff', font=brand_font)
-
-    # Save
-    img.save('/home/trick/src/github.com/trickv/v9n-consulting/just-do-ai/images/justdoai-social-preview.jpg', 'JPEG', quality=95, optimize=True)
-    print("✓ Created justdoai-social-preview.jpg")
+        img.save(tmp_path, 'JPEG', comment=CACHE_TAG + key, **JPEG_SETTINGS)
+        os.replace(tmp_path, card['path'])
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    finally:
+        img.close()
+    return True
+
+def build_cards(cards, jobs=None, force=False):
+    """Build cards on a thread pool, yielding (card, rendered, error) in order.
+
+    Threads share the font and measurement caches, and Pillow releases the
+    GIL while it encodes, which is most of the work.
+    """
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = [(card, executor.submit(build_card, card, force)) for card in cards]
+        for card, future in futures:
+            try:
+                yield card, future.result(), None
+            except Exception as e:
+                yield card, False, e
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate social preview cards from a manifest",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""Examples:
+  %(prog)s                              # Build every card in social-cards.json
+  %(prog)s --dry-run                    # List cards that would change
+  %(prog)s -c justdoai                  # Build one card
+  %(prog)s -o build/site -j 8           # Build into another tree, 8 at a time
+        """
+    )
+    parser.add_argument('manifest', nargs='?', default=DEFAULT_MANIFEST,
+                        help='JSON card manifest (default: social-cards.json next to this script)')
+    parser.add_argument('-o', '--output-root', metavar='DIR',
+                        help="Write outputs under DIR instead of the manifest's output_root")
+    parser.add_argument('-c', '--card', action='append', metavar='NAME',
+                        help='Only build this card (name or output path); repeatable')
+    parser.add_argument('-n', '--dry-run', action='store_true',
+                        help='Report which cards would be created or updated without writing')
+    parser.add_argument('--force', action='store_true',
+                        help='Re-render every card even when its output is current')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                        help='Number of cards to render in parallel (default: CPU count)')
+    args = parser.parse_args()
+
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+
+    try:
+        cards = load_cards(args.manifest, args.output_root)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error: Cannot read manifest {args.manifest}: {e}", file=sys.stderr)
+        sys.exit(1)
+    if args.card:
+        try:
+            cards = select_cards(cards, args.card)
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+
+    if args.dry_run:
+        changes = 0
+        for card in cards:
+            status = card_status(card)
+            if args.force and status == 'current':
+                status = 'stale'
+            if status == 'missing':
+                print(f"Would create {card['path']}")
+            elif status == 'stale':
+                print(f"Would update {card['path']}")
+            changes += status != 'current'
+        print(f"\n{changes} of {len(cards)} card(s) would change")
+        return
+
+    failed = 0
+    skipped = 0
+    for card, rendered, error in build_cards(cards, args.jobs, args.force):
+        if error:
+            print(f"✗ Failed to create {card['output']}: {error}", flush=True)
+            failed += 1
+        elif rendered:
+            print(f"✓ Created {card['output']}", flush=True)
+        else:
+            skipped += 1
+
+    if skipped:
+        print(f"Skipped {skipped} up-to-date card(s)")
+    if failed:
+        print(f"\n✗ {failed} of {len(cards)} social preview image(s) failed")
+        sys.exit(1)
+    print(f"\n✓ All {len(cards)} social preview images are up to date!")
 
 if __name__ == '__main__':
-    create_v9n_preview()
-    create_justdoai_preview()
-    print("\n✓ All social preview images created successfully!")
-    print("  - v9n: /images/v9n-social-preview.jpg")
-    print("  - Just Do AI: /just-do-ai/images/justdoai-social-preview.jpg")
+    main()
@@ -0,0 +1,280 @@
+#!/usr/bin/env -S uv run
+# /// script
+# requires-python = ">=3.8"
+# dependencies = [
+#     "Pillow",
+#     "pillow_heif",
+# ]
+# ///
+"""Benchmark the convert_heic_portable.py conversion path.
+
+generate  build a synthetic HEIC/JPEG/PNG corpus (deterministic content)
+run       time decode/convert/resize/encode per stage and report JSON
+compare   check a run against a saved baseline and flag regressions
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import platform
+import resource
+import sys
+import time
+from PIL import Image
+import PIL
+import pillow_heif
+from convert_heic_portable import decode_image, read_image, to_rgb
+
+DEFAULT_CORPUS = 'bench-corpus'
+DEFAULT_RESOLUTIONS = '1024x768,2048x1536,4032x3024'
+
+# (file suffix, Pillow format, mode, save parameters) per corpus variant
+CORPUS_VARIANTS = [
+    ('rgb8.heic', 'HEIF', 'RGB', {'quality': 80}),
+    ('rgba8.heic', 'HEIF', 'RGBA', {'quality': 80}),
+    ('gray16.heic', 'HEIF', 'I;16', {'quality': 80}),
+    ('rgb8.jpg', 'JPEG', 'RGB', {'quality': 90}),
+    ('rgb8.png', 'PNG', 'RGB', {}),
+    ('rgba8.png', 'PNG', 'RGBA', {}),
+    ('gray16.png', 'PNG', 'I;16', {}),
+]
+
+STAGES = ('decode', 'convert', 'resize', 'encode')
+
+# Width the resize stage scales to, matching a typical web variant
+# (smaller images are halved instead, so the stage never upscales)
+RESIZE_WIDTH = 1920
+
+def parse_resolutions(value):
+    """argparse type for a list like 1024x768,4032x3024."""
+    try:
+        sizes = [tuple(int(n) for n in r.lower().split('x')) for r in value.split(',') if r]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid resolution list: {value}")
+    if not sizes or any(len(s) != 2 or min(s) < 1 for s in sizes):
+        raise argparse.ArgumentTypeError(f"invalid resolution list: {value}")
+    return sizes
+
+def synthetic_image(size, mode):
+    """Render deterministic photo-like content (fractal detail plus smooth
+    gradients) so every machine benchmarks the same pixels."""
+    detail = Image.effect_mandelbrot(size, (-2.2, -1.2, 1.0, 1.2), 100)
+    vertical = Image.linear_gradient('L').resize(size)
+    radial = Image.radial_gradient('L').resize(size)
+    if mode == 'I;16':
+        return detail.convert('I').point(lambda v: v * 257).convert('I;16')
+    img = Image.merge('RGB', (detail, vertical, radial))
+    if mode == 'RGBA':
+        img.putalpha(radial)
+    return img
+
+def generate_corpus(corpus_dir, resolutions):
+    """Write the corpus and an index.json describing every file."""
+    os.makedirs(corpus_dir, exist_ok=True)
+    index = []
+    for size in resolutions:
+        for suffix, fmt, mode, params in CORPUS_VARIANTS:
+            name = f"{size[0]}x{size[1]}-{suffix}"
+            path = os.path.join(corpus_dir, name)
+            synthetic_image(size, mode).save(path, fmt, **params)
+            with open(path, 'rb') as f:
+                digest = hashlib.sha256(f.read()).hexdigest()
+            index.append({
+                'file': name,
+                'format': fmt,
+                'mode': mode,
+                'width': size[0],
+                'height': size[1],
+                'bytes': os.path.getsize(path),
+                'sha256': digest,
+            })
+            print(f"✓ Generated {path}", flush=True)
+    with open(os.path.join(corpus_dir, 'index.json'), 'w') as f:
+        json.dump(index, f, indent=2)
+    return index
+
+def peak_rss_bytes():
+    """Return this process's peak resident set size in bytes."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def time_file(path):
+    """Run one file through each stage and return {stage: (seconds, bytes)}.
+
+    bytes is the data each stage handled: compressed input for decode,
+    decoded pixels for convert and resize, encoded output for encode.
+    """
+    timings = {}
+    start = time.perf_counter()
+    img = decode_image(read_image(path))
+    timings['decode'] = (time.perf_counter() - start, os.path.getsize(path))
+    decoded = img.width * img.height * (2 if img.mode == 'I;16' else len(img.getbands()))
+
+    start = time.perf_counter()
+    img = to_rgb(img)
+    timings['convert'] = (time.perf_counter() - start, decoded)
+
+    start = time.perf_counter()
+    width = min(RESIZE_WIDTH, max(1, img.width // 2))
+    height = max(1, round(img.height * width / img.width))
+    small = img.resize((width, height), Image.LANCZOS, reducing_gap=3.0)
+    timings['resize'] = (time.perf_counter() - start, img.width * img.height * 3)
+
+    start = time.perf_counter()
+    buffer = io.BytesIO()
+    img.save(buffer, 'JPEG', quality=95)
+    timings['encode'] = (time.perf_counter() - start, buffer.tell())
+
+    small.close()
+    img.close()
+    return timings
+
+def run_benchmark(corpus_dir, repeat):
+    """Time every corpus file repeat times and summarise per stage."""
+    with open(os.path.join(corpus_dir, 'index.json')) as f:
+        index = json.load(f)
+    totals = {stage: {'seconds': 0.0, 'bytes': 0, 'images': 0} for stage in STAGES}
+    per_file = []
+    for entry in index:
+        path = os.path.join(corpus_dir, entry['file'])
+        best = None
+        for _ in range(repeat):
+            timings = time_file(path)
+            # Keep the fastest repetition to damp scheduler noise
+            if best is None or sum(t for t, _ in timings.values()) < sum(t for t, _ in best.values()):
+                best = timings
+        for stage, (seconds, nbytes) in best.items():
+            totals[stage]['seconds'] += seconds
+            totals[stage]['bytes'] += nbytes
+            totals[stage]['images'] += 1
+        per_file.append({
+            'file': entry['file'],
+            'stages': {stage: round(seconds, 6) for stage, (seconds, _) in best.items()},
+        })
+        print(f"✓ Timed {entry['file']}", file=sys.stderr, flush=True)
+
+    stages = {}
+    for stage, total in totals.items():
+        seconds = total['seconds'] or 1e-9
+        stages[stage] = {
+            'seconds': round(total['seconds'], 6),
+            'images_per_sec': round(total['images'] / seconds, 3),
+            'mb_per_sec': round(total['bytes'] / seconds / 1e6, 3),
+        }
+    return {
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'pillow': PIL.__version__,
+            'pillow_heif': pillow_heif.__version__,
+            'libheif': pillow_heif.libheif_version(),
+        },
+        'corpus': {e['file']: e['sha256'] for e in index},
+        'repeat': repeat,
+        'stages': stages,
+        'files': per_file,
+        'peak_rss_bytes': peak_rss_bytes(),
+    }
+
+def compare_results(baseline, current, tolerance):
+    """Return a list of regression messages (empty when within tolerance)."""
+    problems = []
+    if baseline.get('corpus') != current.get('corpus'):
+        problems.append("corpus differs from the baseline; results are not comparable")
+    for stage in STAGES:
+        old = baseline['stages'].get(stage, {}).get('images_per_sec')
+        new = current['stages'].get(stage, {}).get('images_per_sec')
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        marker = '✗' if change < -tolerance else '✓'
+        print(f"{marker} {stage:8} {old:10.2f} -> {new:10.2f} images/sec ({change:+.1%})", file=sys.stderr)
+        if change < -tolerance:
+            problems.append(f"{stage} slowed down by {-change:.1%}")
+    old_rss = baseline.get('peak_rss_bytes')
+    new_rss = current.get('peak_rss_bytes')
+    if old_rss and new_rss:
+        change = (new_rss - old_rss) / old_rss
+        marker = '✗' if change > tolerance else '✓'
+        print(f"{marker} {'peak rss':8} {old_rss / 1e6:10.1f} -> {new_rss / 1e6:10.1f} MB ({change:+.1%})", file=sys.stderr)
+        if change > tolerance:
+            problems.append(f"peak RSS grew by {change:.1%}")
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the HEIC conversion path",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""Examples:
+  %(prog)s generate                         # Build ./bench-corpus
+  %(prog)s run -o baseline.json             # Record a baseline
+  %(prog)s run --baseline baseline.json     # Fail if slower than baseline
+  %(prog)s compare baseline.json new.json   # Compare two saved runs
+        """
+    )
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    generate = commands.add_parser('generate', help='Create the synthetic corpus')
+    generate.add_argument('--corpus', default=DEFAULT_CORPUS,
+                          help=f'Corpus directory (default: {DEFAULT_CORPUS})')
+    generate.add_argument('--resolutions', type=parse_resolutions,
+                          default=parse_resolutions(DEFAULT_RESOLUTIONS),
+                          help=f'Comma-separated WxH list (default: {DEFAULT_RESOLUTIONS})')
+
+    run = commands.add_parser('run', help='Time each conversion stage')
+    run.add_argument('--corpus', default=DEFAULT_CORPUS,
+                     help=f'Corpus directory (default: {DEFAULT_CORPUS})')
+    run.add_argument('--repeat', type=int, default=3,
+                     help='Runs per file; the fastest is kept (default: 3)')
+    run.add_argument('-o', '--output', help='Write the JSON report here instead of stdout')
+    run.add_argument('--baseline', help='Compare against this saved report')
+    run.add_argument('--tolerance', type=float, default=0.10,
+                     help='Allowed slowdown before failing (default: 0.10)')
+
+    compare = commands.add_parser('compare', help='Compare two saved reports')
+    compare.add_argument('baseline')
+    compare.add_argument('current')
+    compare.add_argument('--tolerance', type=float, default=0.10,
+                         help='Allowed slowdown before failing (default: 0.10)')
+
+    args = parser.parse_args()
+
+    # Register HEIF opener with Pillow
+    pillow_heif.register_heif_opener()
+
+    if args.command == 'generate':
+        index = generate_corpus(args.corpus, args.resolutions)
+        print(f"\nCorpus complete: {len(index)} file(s) in {args.corpus}")
+        return
+
+    if args.command == 'run':
+        if not os.path.exists(os.path.join(args.corpus, 'index.json')):
+            print(f"Error: No corpus in {args.corpus}; run '{parser.prog} generate' first",
+                  file=sys.stderr)
+            sys.exit(1)
+        current = run_benchmark(args.corpus, max(1, args.repeat))
+        report = json.dumps(current, indent=2)
+        if args.output:
+            with open(args.output, 'w') as f:
+                f.write(report + '\n')
+        else:
+            print(report)
+        if not args.baseline:
+            return
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    else:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+
+    problems = compare_results(baseline, current, args.tolerance)
+    for problem in problems:
+        print(f"Regression: {problem}", file=sys.stderr)
+    sys.exit(1 if problems else 0)
+
+if __name__ == "__main__":
+    main()
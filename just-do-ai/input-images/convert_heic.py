@@ -1,20 +1,49 @@
 #!/usr/bin/env python3
+import argparse
 import glob
 import os
 from PIL import Image
 import pillow_heif
+from convert_heic_portable import (
+    DEFAULT_MANIFEST,
+    JPEG_SETTINGS,
+    iter_image_files,
+    load_manifest,
+    metadata_params,
+    pending_files,
+    record_conversion,
+    save_manifest,
+)
+
+parser = argparse.ArgumentParser(description="Convert HEIC files in the current directory to JPEG")
+parser.add_argument('--incremental', action='store_true',
+                    help='Skip files whose JPEG is already current')
+parser.add_argument('--recursive', metavar='DIR',
+                    help='Convert every .heic/.heif/.avif file under DIR instead')
+args = parser.parse_args()
+incremental = args.incremental
 
 # Register HEIF opener with Pillow
 pillow_heif.register_heif_opener()
 
-# Get all HEIC files in current directory
-heic_files = glob.glob("*.HEIC")
+if args.recursive:
+    # Stream paths from the tree walk so conversion starts immediately
+    heic_files = iter_image_files(args.recursive)
+    print(f"Converting HEIC files under {args.recursive}")
+else:
+    # Get all HEIC files in current directory
+    heic_files = glob.glob("*.HEIC")
+
+    if not heic_files:
+        print("No HEIC files found in current directory")
+        exit()
 
-if not heic_files:
-    print("No HEIC files found in current directory")
-    exit()
+    print(f"Found {len(heic_files)} HEIC files to convert")
 
-print(f"Found {len(heic_files)} HEIC files to convert")
+stats = {'skipped': 0}
+if incremental:
+    manifest = load_manifest(DEFAULT_MANIFEST)
+    heic_files = pending_files(heic_files, manifest, JPEG_SETTINGS, stats)
 
 converted = 0
 failed = 0
@@ -31,12 +60,19 @@ for heic_file in heic_files:
             jpg_file = os.path.splitext(heic_file)[0] + '.jpg'
             
             # Save as JPEG with high quality
-            img.save(jpg_file, 'JPEG', quality=95)
+            img.save(jpg_file, JPEG_SETTINGS['format'], quality=JPEG_SETTINGS['quality'],
+                     **metadata_params(img, JPEG_SETTINGS))
             print(f"✓ Converted {heic_file} -> {jpg_file}")
             converted += 1
+            if incremental:
+                record_conversion(manifest, heic_file, JPEG_SETTINGS, [jpg_file])
             
     except Exception as e:
         print(f"✗ Failed to convert {heic_file}: {str(e)}")
         failed += 1
 
+if incremental:
+    save_manifest(DEFAULT_MANIFEST, manifest)
+    print(f"Skipped {stats['skipped']} up-to-date file(s)")
+
 print(f"\nConversion complete: {converted} successful, {failed} failed")
\ No newline at end of file
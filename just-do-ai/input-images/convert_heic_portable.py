@@ -1,37 +1,1212 @@
 #!/usr/bin/env -S uv run
 # /// script
-# requires-python = ">=3.8"
+# requires-python = ">=3.9"
 # dependencies = [
 #     "Pillow",
 #     "pillow_heif",
 # ]
 # ///
 import argparse
+import hashlib
+import io
+import json
+import math
 import os
+import queue
+import re
+import shutil
+import signal
+import struct
 import sys
-from PIL import Image
+import threading
+import time
+import tracemalloc
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import contextmanager
+from itertools import groupby, islice
+from PIL import Image, ImageMath
 import pillow_heif
 
-def convert_heic_file(heic_file):
-    """Convert a single HEIC file to JPEG."""
+# Encoder settings recorded in the manifest; changing them forces re-conversion
+JPEG_SETTINGS = {'format': 'JPEG', 'quality': 95}
+
+DEFAULT_MANIFEST = '.heic-manifest.json'
+
+DEFAULT_JOURNAL = '.heic-journal.jsonl'
+
+# --format name -> (file extension, Pillow format, MIME type)
+OUTPUT_FORMATS = {
+    'jpeg': ('.jpg', 'JPEG', 'image/jpeg'),
+    'webp': ('.webp', 'WEBP', 'image/webp'),
+    'avif': ('.avif', 'AVIF', 'image/avif'),
+}
+
+# Quality range searched by --max-bytes / --min-ssim
+MIN_SEARCH_QUALITY = 30
+MAX_SEARCH_QUALITY = 95
+
+# Similarity is measured on at most this many pixels along the long side
+SSIM_MAX_SIDE = 2048
+
+# EXIF tag pointing at the GPS IFD, dropped by --strip gps
+GPS_IFD_TAG = 0x8825
+
+# EXIF orientation value -> transpose that makes the image upright
+ORIENTATION_TAG = 0x0112
+ORIENTATION_TRANSPOSE = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+# Stages reported by --profile / --trace, in pipeline order
+PROFILE_STAGES = ('read', 'decode', 'convert', 'encode')
+
+# Extensions picked up by --recursive, matched case-insensitively
+INPUT_EXTENSIONS = ('.heic', '.heif', '.avif')
+
+# Added to the output name when a source is already in that format (say
+# IMG.jpg re-encoded as JPEG), so the original is never overwritten
+SOURCE_SUFFIX = '-converted'
+
+def output_path(heic_file, width=None, fmt='jpeg'):
+    """Return the output path written next to a HEIC file.
+
+    With a width, this is the path of that responsive variant. A source
+    that would be its own output gets SOURCE_SUFFIX instead.
+    """
+    base = os.path.splitext(heic_file)[0]
+    extension = OUTPUT_FORMATS[fmt][0]
+    if width is not None:
+        return f"{base}-{width}w{extension}"
+    if same_file(base + extension, heic_file):
+        return base + SOURCE_SUFFIX + extension
+    return base + extension
+
+def same_file(path, other):
+    """Check whether two paths name the same file.
+
+    Uses the filesystem when path exists, so IMG.JPG and IMG.jpg match on
+    case-insensitive volumes (default macOS APFS) as well as via links.
+    """
     try:
-        # Open HEIC file
+        return os.path.samefile(path, other)
+    except OSError:
+        return os.path.normcase(os.path.abspath(path)) == os.path.normcase(os.path.abspath(other))
+
+def sidecar_path(heic_file):
+    """Return the JSON sidecar describing the variants of heic_file."""
+    return os.path.splitext(heic_file)[0] + '.variants.json'
+
+def build_settings(args):
+    """Return the encoder settings for a run (recorded in the manifest)."""
+    settings = dict(JPEG_SETTINGS)
+    settings['quality'] = args.jpeg_quality
+    formats = list(dict.fromkeys(args.formats or ['jpeg']))
+    if formats != ['jpeg']:
+        settings['formats'] = formats
+    if 'webp' in formats:
+        settings['webp'] = {'quality': args.webp_quality, 'method': args.webp_method}
+    if 'avif' in formats:
+        settings['avif'] = {'quality': args.avif_quality, 'speed': args.avif_speed}
+    if args.max_size:
+        settings['max_size'] = args.max_size
+    if args.sizes:
+        settings['sizes'] = sorted(set(args.sizes))
+    if args.max_bytes:
+        settings['max_bytes'] = args.max_bytes
+    if args.min_ssim:
+        settings['min_ssim'] = args.min_ssim
+    if args.strip:
+        settings['strip'] = args.strip
+    return settings
+
+def parse_bytes(value):
+    """argparse type for byte counts such as 200k or 1.5M (k = 1000)."""
+    multipliers = {'k': 1000, 'm': 1000 ** 2}
+    number = value.strip().lower()
+    multiplier = multipliers.get(number[-1:], 1)
+    if multiplier != 1:
+        number = number[:-1]
+    try:
+        size = int(float(number) * multiplier)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid byte count: {value}")
+    if size < 1:
+        raise argparse.ArgumentTypeError(f"invalid byte count: {value}")
+    return size
+
+def parse_sizes(value):
+    """argparse type for --sizes: a comma-separated list of widths."""
+    try:
+        sizes = [int(v) for v in value.split(',') if v.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid width list: {value}")
+    if not sizes or min(sizes) < 1:
+        raise argparse.ArgumentTypeError(f"invalid width list: {value}")
+    return sizes
+
+def iter_image_files(root):
+    """Yield HEIC/HEIF/AVIF files under root as they are found.
+
+    Directories are walked with an explicit stack of pending subdirectories
+    and entries are consumed straight from os.scandir(), so memory use stays
+    flat however many files the tree holds.
+    """
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.name.lower().endswith(INPUT_EXTENSIONS) and entry.is_file():
+                        yield entry.path
+        except OSError as e:
+            print(f"Warning: Cannot read directory {directory}: {str(e)}", file=sys.stderr)
+
+def file_hash(path):
+    """Return the SHA-256 hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def load_manifest(manifest_file):
+    """Load the conversion manifest, or start an empty one."""
+    try:
+        with open(manifest_file) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        print(f"Warning: Ignoring unreadable manifest {manifest_file}: {str(e)}", file=sys.stderr)
+        return {}
+    return manifest if isinstance(manifest, dict) else {}
+
+def save_manifest(manifest_file, manifest):
+    """Write the manifest atomically so an interrupted run can't corrupt it."""
+    tmp_file = manifest_file + '.tmp'
+    with open(tmp_file, 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_file, manifest_file)
+
+def is_up_to_date(manifest, heic_file, settings):
+    """Check whether the output recorded for heic_file is still valid."""
+    entry = manifest.get(os.path.abspath(heic_file))
+    if not entry or entry.get('settings') != settings:
+        return False
+    if not all(os.path.exists(f) for f in entry.get('outputs', [None])):
+        return False
+    
+    st = os.stat(heic_file)
+    if st.st_size != entry['size']:
+        return False
+    if st.st_mtime_ns == entry['mtime_ns']:
+        return True
+    
+    # Same size but touched (copied, restored from backup...): only the
+    # content hash can tell whether it really changed
+    if file_hash(heic_file) != entry['sha256']:
+        return False
+    entry['mtime_ns'] = st.st_mtime_ns
+    return True
+
+def pending_files(files, manifest, settings, stats):
+    """Lazily drop up-to-date files, counting them in stats['skipped']."""
+    for heic_file in files:
+        if is_up_to_date(manifest, heic_file, settings):
+            stats['skipped'] += 1
+        else:
+            yield heic_file
+
+def record_conversion(manifest, heic_file, settings, outputs):
+    """Record a successful conversion of heic_file in the manifest."""
+    st = os.stat(heic_file)
+    manifest[os.path.abspath(heic_file)] = {
+        'outputs': [os.path.abspath(f) for f in outputs],
+        'size': st.st_size,
+        'mtime_ns': st.st_mtime_ns,
+        'sha256': file_hash(heic_file),
+        'settings': settings,
+    }
+
+class Journal:
+    """Append-only log of finished files, so an interrupted batch can resume.
+
+    Each completed file is one JSON line, flushed and fsynced before the
+    next result is handled, so a crash loses at most the files in flight.
+    A torn last line from a crash mid-write is cut off on reload, so the
+    next record starts on a line of its own.
+    """
+
+    def __init__(self, path, settings, resume=False):
+        self.settings = settings
+        self.done = {}
+        if resume:
+            try:
+                with open(path, 'rb+') as f:
+                    complete = 0
+                    for line in f:
+                        if not line.endswith(b'\n'):
+                            break
+                        complete += len(line)
+                        try:
+                            entry = json.loads(line)
+                        except ValueError:
+                            continue
+                        self.done[entry['file']] = entry
+                    f.truncate(complete)
+            except FileNotFoundError:
+                pass
+        self.file = open(path, 'a' if resume else 'w')
+
+    def is_done(self, heic_file):
+        """Check whether heic_file finished earlier with unchanged source and outputs."""
+        entry = self.done.get(os.path.abspath(heic_file))
+        if not entry or entry['settings'] != self.settings:
+            return False
+        st = os.stat(heic_file)
+        if (st.st_size, st.st_mtime_ns) != (entry['size'], entry['mtime_ns']):
+            return False
+        return all(os.path.exists(f) for f in entry['outputs'])
+
+    def pending(self, files, stats):
+        """Lazily drop files already finished, counting them in stats['skipped']."""
+        for heic_file in files:
+            if self.is_done(heic_file):
+                stats['skipped'] += 1
+            else:
+                yield heic_file
+
+    def record(self, heic_file, outputs):
+        st = os.stat(heic_file)
+        self.file.write(json.dumps({
+            'file': os.path.abspath(heic_file),
+            'outputs': [os.path.abspath(f) for f in outputs],
+            'size': st.st_size,
+            'mtime_ns': st.st_mtime_ns,
+            'settings': self.settings,
+        }) + '\n')
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self.file.close()
+
+def _iter_boxes(data, start, end):
+    """Yield (type, body_start, box_end) for the ISOBMFF boxes in a range."""
+    offset = start
+    while offset + 8 <= end:
+        size, box_type = struct.unpack('>I4s', data[offset:offset + 8])
+        header = 8
+        if size == 1:
+            size = struct.unpack('>Q', data[offset + 8:offset + 16])[0]
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header:
+            return
+        yield box_type, offset + header, offset + size
+        offset += size
+
+def expose_heif_thumbnails(data):
+    """Return HEIF bytes in which embedded thumbnails are top-level images.
+
+    libheif hides items that carry a 'thmb' reference, and pillow_heif only
+    reports their sizes. Renaming those references (same length, so no
+    offsets move) makes libheif list each thumbnail as an ordinary image
+    that pillow_heif can decode on its own.
+    """
+    data = bytearray(data)
+    for box_type, body, end in _iter_boxes(data, 0, len(data)):
+        if box_type != b'meta':
+            continue
+        # meta and iref are full boxes: skip version and flags
+        for child_type, child_body, child_end in _iter_boxes(data, body + 4, end):
+            if child_type != b'iref':
+                continue
+            for ref_type, ref_body, _ in _iter_boxes(data, child_body + 4, child_end):
+                if ref_type == b'thmb':
+                    data[ref_body - 4:ref_body] = b'pthm'
+    return bytes(data)
+
+def _open_heif_preview(heic_file, max_size):
+    """Decode the smallest HEIF image (thumbnail or primary) covering max_size."""
+    with open(heic_file, 'rb') as f:
+        heif_file = pillow_heif.open_heif(expose_heif_thumbnails(f.read()))
+    primary = heif_file[heif_file.primary_index]
+    aspect = primary.size[0] / primary.size[1]
+    best = primary
+    for image in heif_file:
+        # Thumbnails keep the primary image's aspect ratio; other
+        # top-level images (bursts, alternates) are left alone
+        if image is primary or abs(image.size[0] / image.size[1] - aspect) > 0.01:
+            continue
+        if max(image.size) >= max_size and max(image.size) < max(best.size):
+            best = image
+    img = best.to_pillow()
+    if best is not primary:
+        for key in ('exif', 'xmp', 'icc_profile'):
+            if primary.info.get(key):
+                img.info[key] = primary.info[key]
+    return img
+
+def open_preview(heic_file, max_size):
+    """Open heic_file for a preview no larger than max_size pixels.
+
+    HEIF files are decoded from the smallest embedded thumbnail that still
+    covers max_size, falling back to the primary image. JPEGs use a
+    DCT-scaled draft decode (1/2, 1/4 or 1/8 size). Anything else is opened
+    normally and scaled down after decoding.
+    """
+    if pillow_heif.get_file_mimetype(heic_file).startswith('image/hei'):
+        return _open_heif_preview(heic_file, max_size)
+    img = Image.open(heic_file)
+    if img.format == 'JPEG':
+        # draft() scales until either side would drop below the requested
+        # box, so ask for the fitted size rather than a max_size square
+        scale = max_size / max(img.size)
+        if scale < 1:
+            img.draft(img.mode, (max(1, int(img.width * scale)), max(1, int(img.height * scale))))
+    return img
+
+def read_image(heic_file, settings=JPEG_SETTINGS):
+    """Open an image file, reading its headers but not decoding pixels."""
+    if settings.get('max_size'):
+        return open_preview(heic_file, settings['max_size'])
+    return Image.open(heic_file)
+
+def decode_image(img):
+    """Decode the pixel data of an opened image."""
+    img.load()
+    return img
+
+def to_rgb(img):
+    """Convert to RGB if necessary, releasing the decoded original."""
+    if img.mode == 'RGB':
+        return img
+    rgb = img.convert('RGB')
+    img.close()
+    return rgb
+
+def orientation_transpose(img):
+    """Return the transpose that makes img upright, or None if it already is.
+
+    HEIF images never need one: libheif applies irot/imir while decoding
+    and pillow_heif resets the EXIF tag to match.
+    """
+    return ORIENTATION_TRANSPOSE.get(img.getexif().get(ORIENTATION_TAG))
+
+def upright_size(size, method):
+    """Return the size of an image of the given size after transposing."""
+    if method in (Image.Transpose.TRANSPOSE, Image.Transpose.TRANSVERSE,
+                  Image.Transpose.ROTATE_90, Image.Transpose.ROTATE_270):
+        return size[1], size[0]
+    return size
+
+def apply_orientation(img, method):
+    """Return img transposed upright with its orientation tag reset.
+
+    Callers that also resize should do so first, so the transpose copies
+    the smaller image.
+    """
+    if method is None:
+        return img
+    upright = img.transpose(method)
+    exif = upright.getexif()
+    if ORIENTATION_TAG in exif:
+        del exif[ORIENTATION_TAG]
+        upright.info['exif'] = exif.tobytes()
+    if upright.info.get('xmp'):
+        upright.info['xmp'] = re.sub(rb'(tiff:Orientation(?:="|>))[1-8]', rb'\g<1>1', upright.info['xmp'])
+    return upright
+
+def prepare_image(img, settings):
+    """Bring a decoded image to RGB, upright and, in preview mode, down to max_size.
+
+    With --sizes the transpose is left to encode_variants(), which applies
+    it after the first downscale.
+    """
+    img = to_rgb(img)
+    max_size = settings.get('max_size')
+    if max_size and max(img.size) > max_size:
+        img.thumbnail((max_size, max_size), Image.LANCZOS, reducing_gap=3.0)
+    if not settings.get('sizes'):
+        upright = apply_orientation(img, orientation_transpose(img))
+        if upright is not img:
+            img.close()
+            img = upright
+    return img
+
+def output_formats(settings):
+    """Return the --format names to write, in order."""
+    return settings.get('formats', ['jpeg'])
+
+def encoder_params(fmt, settings):
+    """Return the Pillow save() parameters for one output format."""
+    if fmt == 'jpeg':
+        return {'quality': settings['quality']}
+    return dict(settings[fmt])
+
+def _strip_xmp_gps(xmp):
+    """Remove exif:GPS* properties (attributes or elements) from an XMP packet."""
+    xmp = re.sub(rb'\s+exif:GPS\w+="[^"]*"', b'', xmp)
+    xmp = re.sub(rb'<exif:GPS\w+[^>]*/>', b'', xmp)
+    return re.sub(rb'<exif:(GPS\w+)[^>]*>.*?</exif:\1>', b'', xmp, flags=re.DOTALL)
+
+def metadata_params(img, settings):
+    """Return the save() parameters carrying img's EXIF, XMP and ICC profile.
+
+    With --strip gps the GPS IFD and XMP location properties are dropped;
+    with --strip all nothing is carried over.
+    """
+    strip = settings.get('strip')
+    if strip == 'all':
+        return {}
+    params = {key: img.info[key] for key in ('exif', 'xmp', 'icc_profile') if img.info.get(key)}
+    if strip == 'gps':
+        if 'exif' in params:
+            exif = Image.Exif()
+            exif.load(params['exif'])
+            if GPS_IFD_TAG in exif:
+                del exif[GPS_IFD_TAG]
+                params['exif'] = exif.tobytes()
+        if 'xmp' in params:
+            params['xmp'] = _strip_xmp_gps(params['xmp'])
+    return params
+
+def encode_bytes(img, fmt, params, progressive=False):
+    """Encode img in memory and return the bytes.
+
+    JPEG always gets optimized Huffman tables here; only the caller knows
+    whether a progressive scan is worth trying.
+    """
+    buffer = io.BytesIO()
+    if fmt == 'jpeg':
+        params = dict(params, optimize=True, progressive=progressive)
+    img.save(buffer, OUTPUT_FORMATS[fmt][1], **params)
+    return buffer.getvalue()
+
+def _block_stats(lum, block=8):
+    """Return (mean, mean of squares) maps over block x block tiles."""
+    square = ImageMath.lambda_eval(lambda a: a['x'] * a['x'], x=lum)
+    return lum.reduce(block), square.reduce(block)
+
+def _luminance(img):
+    """Return img as a float luminance image, scaled down for comparison."""
+    lum = img.convert('L')
+    factor = -(-max(lum.size) // SSIM_MAX_SIDE)
+    if factor > 1:
+        lum = lum.reduce(factor)
+    return lum.convert('F')
+
+def ssim_reference(img):
+    """Precompute the source side of ssim() so trial encodes can share it."""
+    lum = _luminance(img)
+    return lum, _block_stats(lum)
+
+def ssim(reference, data):
+    """Mean SSIM of the luminance of encoded image data against reference.
+
+    Uses non-overlapping 8x8 windows and Pillow's float image maths, so no
+    per-pixel Python loop runs; the source statistics come precomputed from
+    ssim_reference().
+    """
+    ref_lum, (mu_x, sq_x) = reference
+    with Image.open(io.BytesIO(data)) as trial:
+        lum = _luminance(trial)
+    mu_y, sq_y = _block_stats(lum)
+    cross = ImageMath.lambda_eval(lambda a: a['x'] * a['y'], x=ref_lum, y=lum).reduce(8)
+    c1 = (0.01 * 255) ** 2
+    c2 = (0.03 * 255) ** 2
+    ssim_map = ImageMath.lambda_eval(
+        lambda a: ((a['mx'] * a['my'] * 2 + c1) * ((a['xy'] - a['mx'] * a['my']) * 2 + c2))
+        / ((a['mx'] * a['mx'] + a['my'] * a['my'] + c1)
+           * (a['xx'] - a['mx'] * a['mx'] + a['yy'] - a['my'] * a['my'] + c2)),
+        mx=mu_x, my=mu_y, xx=sq_x, yy=sq_y, xy=cross,
+    )
+    # ImageStat bins float images, so average the (small) map directly
+    values = ssim_map.getdata()
+    return sum(values) / len(values)
+
+def search_quality(img, fmt, settings):
+    """Pick the encoder quality for img and return (quality, data).
+
+    Binary-searches quality against the byte budget (highest quality that
+    fits) and/or the SSIM floor (lowest quality that still looks the same),
+    taking the lower of the two. Trials are encoded in memory from the same
+    decoded pixels. For JPEG the final encode keeps progressive only when
+    it is smaller than baseline.
+    """
+    max_bytes = settings.get('max_bytes')
+    min_ssim = settings.get('min_ssim')
+    # Metadata counts against the byte budget, so trials carry it too
+    params = dict(encoder_params(fmt, settings), **metadata_params(img, settings))
+    trials = {}
+
+    def trial(quality):
+        if quality not in trials:
+            trials[quality] = encode_bytes(img, fmt, dict(params, quality=quality))
+        return trials[quality]
+
+    def bisect(ok, prefer_high):
+        # Find the boundary of a predicate that is monotonic in quality
+        lo, hi = MIN_SEARCH_QUALITY, MAX_SEARCH_QUALITY
+        best = None
+        while lo <= hi:
+            mid = (lo + hi) // 2
+            if ok(mid):
+                best = mid
+                if prefer_high:
+                    lo = mid + 1
+                else:
+                    hi = mid - 1
+            elif prefer_high:
+                hi = mid - 1
+            else:
+                lo = mid + 1
+        return best
+
+    candidates = []
+    if max_bytes:
+        fits = bisect(lambda q: len(trial(q)) <= max_bytes, prefer_high=True)
+        # Nothing fits: the lowest quality is the closest we can get
+        candidates.append(MIN_SEARCH_QUALITY if fits is None else fits)
+    if min_ssim:
+        reference = ssim_reference(img)
+        similar = bisect(lambda q: ssim(reference, trial(q)) >= min_ssim, prefer_high=False)
+        candidates.append(MAX_SEARCH_QUALITY if similar is None else similar)
+    quality = min(candidates)
+
+    data = trial(quality)
+    if fmt == 'jpeg':
+        progressive = encode_bytes(img, fmt, dict(params, quality=quality), progressive=True)
+        if len(progressive) < len(data):
+            data = progressive
+    return quality, data
+
+@contextmanager
+def atomic_write(path):
+    """Yield a temporary path next to path, renamed over it on success.
+
+    An interrupted or failed write leaves at most a hidden .tmp file (reused
+    by the next attempt), never a truncated file under the real output name.
+    The data is fsynced before the rename, so after a power loss a file
+    under the real name (and any journal entry for it) is complete.
+    """
+    directory, name = os.path.split(path)
+    tmp_path = os.path.join(directory, f".{name}.tmp")
+    try:
+        yield tmp_path
+        fd = os.open(tmp_path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def save_output(img, path, fmt, settings):
+    """Write img to path in the given format and return the quality used."""
+    if settings.get('max_bytes') or settings.get('min_ssim'):
+        quality, data = search_quality(img, fmt, settings)
+        max_bytes = settings.get('max_bytes')
+        if max_bytes and len(data) > max_bytes:
+            print(f"Warning: {path} is {len(data)} bytes even at quality {quality}, "
+                  f"over the --max-bytes budget of {max_bytes}", file=sys.stderr, flush=True)
+        with atomic_write(path) as tmp_path, open(tmp_path, 'wb') as f:
+            f.write(data)
+        return quality
+    params = encoder_params(fmt, settings)
+    with atomic_write(path) as tmp_path:
+        img.save(tmp_path, OUTPUT_FORMATS[fmt][1], **params, **metadata_params(img, settings))
+    return params['quality']
+
+def _check_not_source(path, heic_file):
+    """Refuse to write an output over its own source file."""
+    if same_file(path, heic_file):
+        raise ValueError(f"output {path} would overwrite the source file")
+
+def passthrough_jpeg(heic_file, settings):
+    """Copy a JPEG input byte for byte when re-encoding would only lose detail.
+
+    Applies when JPEG is the only output, no width variants or metadata
+    stripping are requested, and the file already fits --max-size and
+    --max-bytes. Only the header is read, never the pixels. Returns the
+    output list, or None when the file needs a real conversion. A foo.jpg
+    input is its own output, so it is left in place and returned as is.
+    """
+    if output_formats(settings) != ['jpeg'] or settings.get('sizes') or settings.get('strip'):
+        return None
+    with open(heic_file, 'rb') as f:
+        if f.read(3) != b'\xff\xd8\xff':
+            return None
+    max_bytes = settings.get('max_bytes')
+    if max_bytes and os.path.getsize(heic_file) > max_bytes:
+        return None
+    max_size = settings.get('max_size')
+    if max_size:
         with Image.open(heic_file) as img:
-            # Convert to RGB if necessary
-            if img.mode != 'RGB':
-                img = img.convert('RGB')
+            if max(img.size) > max_size:
+                return None
+    if same_file(os.path.splitext(heic_file)[0] + OUTPUT_FORMATS['jpeg'][0], heic_file):
+        return [heic_file]
+    out_file = output_path(heic_file)
+    with atomic_write(out_file) as tmp_path:
+        shutil.copyfile(heic_file, tmp_path)
+    return [out_file]
+
+def report_passthrough(heic_file, outputs):
+    """Print the result of a passthrough_jpeg() that applied."""
+    if outputs == [heic_file]:
+        print(f"✓ Kept {heic_file} (already a JPEG in place)", flush=True)
+    else:
+        print(f"✓ Copied {heic_file} -> {outputs[0]} (already a JPEG)", flush=True)
+
+def encode_variants(img, heic_file, settings):
+    """Write each output format per requested width plus a JSON sidecar.
+
+    Widths are produced largest first, each downscaled from the previous
+    variant rather than from the full image, so only the first resize
+    touches every source pixel; every format is encoded from that same
+    resized image. Widths at or above the source width collapse into a
+    single full-width variant (no upscaling). A sideways source is only
+    turned upright once it has been scaled down to the largest width.
+    """
+    formats = output_formats(settings)
+    method = orientation_transpose(img)
+    full_width, full_height = upright_size(img.size, method)
+    widths = sorted({min(w, full_width) for w in settings['sizes']}, reverse=True)
+    variants = []
+    current = img
+    for width in widths:
+        height = max(1, round(full_height * width / full_width))
+        target = upright_size((width, height), method)
+        if target != current.size:
+            resized = current.resize(target, Image.LANCZOS, reducing_gap=3.0)
+            if current is not img:
+                current.close()
+            current = resized
+        if method is not None:
+            upright = apply_orientation(current, method)
+            if current is not img:
+                current.close()
+            current = upright
+            method = None
+        for fmt in formats:
+            variant_file = output_path(heic_file, width, fmt)
+            _check_not_source(variant_file, heic_file)
+            quality = save_output(current, variant_file, fmt, settings)
+            variants.append({
+                'file': os.path.basename(variant_file),
+                'format': fmt,
+                'width': width,
+                'height': height,
+                'bytes': os.path.getsize(variant_file),
+                'quality': quality,
+            })
+    if current is not img:
+        current.close()
+    
+    variants.sort(key=lambda v: (v['width'], formats.index(v['format'])))
+    srcset = {}
+    for fmt in formats:
+        mimetype = OUTPUT_FORMATS[fmt][2]
+        srcset[mimetype] = ', '.join(
+            f"{v['file']} {v['width']}w" for v in variants if v['format'] == fmt
+        )
+    sidecar = {
+        'source': os.path.basename(heic_file),
+        'width': full_width,
+        'height': full_height,
+        'variants': variants,
+        'srcset': srcset,
+    }
+    sidecar_file = sidecar_path(heic_file)
+    with atomic_write(sidecar_file) as tmp_path, open(tmp_path, 'w') as f:
+        json.dump(sidecar, f, indent=2)
+    outputs = [output_path(heic_file, v['width'], v['format']) for v in variants]
+    return outputs + [sidecar_file]
+
+def encode_image(img, heic_file, settings):
+    """Encode an RGB image next to heic_file and return the output paths.
+
+    Every requested format is encoded from the same decoded image.
+    """
+    if settings.get('sizes'):
+        return encode_variants(img, heic_file, settings)
+    outputs = []
+    for fmt in output_formats(settings):
+        out_file = output_path(heic_file, fmt=fmt)
+        _check_not_source(out_file, heic_file)
+        if out_file != os.path.splitext(heic_file)[0] + OUTPUT_FORMATS[fmt][0]:
+            print(f"Warning: {heic_file} is already {OUTPUT_FORMATS[fmt][1]}; "
+                  f"writing {out_file} to keep the original", file=sys.stderr)
+        save_output(img, out_file, fmt, settings)
+        outputs.append(out_file)
+    return outputs
+
+def image_bytes(img):
+    """Approximate size of a Pillow image buffer (multi-band pixels are 4 bytes)."""
+    pixel_size = {'1': 1, 'L': 1, 'P': 1, 'I;16': 2}.get(img.mode, 4)
+    return img.width * img.height * pixel_size
+
+@contextmanager
+def measure_stage(stages, name):
+    """Record wall time, CPU time and allocated bytes of a block in stages[name].
+
+    Does nothing when stages is None. Pillow and libheif allocate pixels
+    outside tracemalloc's view, so allocations are the traced Python peak
+    (e.g. in-memory encodes) plus the buffers of any images the block
+    appends to the yielded list. The peak is process-wide, so it is only
+    counted when tracemalloc runs, which main() skips for the threaded
+    --memory-budget pipeline.
+    """
+    if stages is None:
+        yield []
+        return
+    new_images = []
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+    wall = time.perf_counter()
+    cpu = time.thread_time()
+    yield new_images
+    allocated = tracemalloc.get_traced_memory()[1] - base if tracing else 0
+    stages[name] = {
+        'wall': time.perf_counter() - wall,
+        'cpu': time.thread_time() - cpu,
+        'alloc_bytes': allocated + sum(image_bytes(i) for i in new_images),
+    }
+
+def convert_heic_file(heic_file, settings=JPEG_SETTINGS, stages=None):
+    """Convert a single HEIC file to JPEG, returning the outputs or None.
+
+    When stages is a dict, the cost of each stage is recorded into it.
+    """
+    try:
+        # Already a JPEG that needs no changes: copy it through
+        outputs = passthrough_jpeg(heic_file, settings)
+        if outputs:
+            report_passthrough(heic_file, outputs)
+            return outputs
+        
+        # Open HEIC file
+        with measure_stage(stages, 'read'):
+            img = read_image(heic_file, settings)
+        with img:
+            with measure_stage(stages, 'decode') as new_images:
+                img = decode_image(img)
+                new_images.append(img)
             
-            # Create output filename
-            jpg_file = os.path.splitext(heic_file)[0] + '.jpg'
+            # Convert to RGB (and preview size) if necessary
+            with measure_stage(stages, 'convert') as new_images:
+                prepared = prepare_image(img, settings)
+                if prepared is not img:
+                    new_images.append(prepared)
+                img = prepared
             
             # Save as JPEG with high quality
-            img.save(jpg_file, 'JPEG', quality=95)
-            print(f"✓ Converted {heic_file} -> {jpg_file}")
-            return True
+            with measure_stage(stages, 'encode'):
+                outputs = encode_image(img, heic_file, settings)
+            img.close()
+            print(f"✓ Converted {heic_file} -> {', '.join(outputs)}", flush=True)
+            return outputs
             
     except Exception as e:
-        print(f"✗ Failed to convert {heic_file}: {str(e)}")
+        print(f"✗ Failed to convert {heic_file}: {str(e)}", flush=True)
+        return None
+
+def _convert_profiled(heic_file, settings):
+    """Pool entry point for --profile: return (outputs, stage costs)."""
+    stages = {}
+    outputs = convert_heic_file(heic_file, settings, stages)
+    return outputs, stages
+
+def _percentile(values, fraction):
+    """Nearest-rank percentile of a sorted list."""
+    index = max(0, min(len(values) - 1, math.ceil(fraction * len(values)) - 1))
+    return values[index]
+
+class ConversionProfile:
+    """Collects per-file stage costs, streams them to a trace, summarises."""
+
+    def __init__(self, trace_file=None):
+        self.samples = {}
+        self.files = 0
+        self.trace = open(trace_file, 'w') if trace_file else None
+
+    def add(self, heic_file, outputs, stages):
+        self.files += 1
+        for name, record in stages.items():
+            for key, value in record.items():
+                self.samples.setdefault(name, {}).setdefault(key, []).append(value)
+        if self.trace:
+            self.trace.write(json.dumps({
+                'file': heic_file,
+                'ok': bool(outputs),
+                'outputs': outputs or [],
+                'stages': stages,
+            }) + '\n')
+            self.trace.flush()
+
+    def close(self):
+        if self.trace:
+            self.trace.close()
+            self.trace = None
+
+    def print_summary(self):
+        """Print p50/p95/max of wall time, CPU time and allocations per stage."""
+        print(f"\nStage profile ({self.files} file(s)):")
+        print(f"{'stage':<8} {'wall ms p50/p95/max':>24} {'cpu ms p50/p95/max':>24} {'alloc MB p50/p95/max':>24}")
+        for name in PROFILE_STAGES:
+            if name not in self.samples:
+                continue
+            columns = []
+            for key, scale in (('wall', 1e3), ('cpu', 1e3), ('alloc_bytes', 1e-6)):
+                values = sorted(self.samples[name][key])
+                columns.append('/'.join(
+                    f"{v * scale:.1f}" for v in (_percentile(values, 0.5), _percentile(values, 0.95), values[-1])
+                ))
+            print(f"{name:<8} {columns[0]:>24} {columns[1]:>24} {columns[2]:>24}")
+
+class PixelBudget:
+    """Counting semaphore that limits decoded pixels in flight, not files."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.used = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, pixels):
+        with self._cond:
+            # An image bigger than the whole budget still runs, but alone
+            while self.used and self.used + pixels > self.limit:
+                self._cond.wait()
+            self.used += pixels
+
+    def release(self, pixels):
+        with self._cond:
+            self.used -= pixels
+            self._cond.notify_all()
+
+def convert_pipeline(files, workers, budget_pixels, settings, on_success=None, profile=None):
+    """Convert files in-process through read/decode/convert/encode stages.
+
+    Stages run in threads connected by bounded queues (Pillow and libheif
+    release the GIL while decoding, converting and encoding). An image's
+    pixel count is reserved from the budget before it is decoded and given
+    back once it is encoded, so peak memory follows megapixels in flight
+    rather than the number of files. Returns (converted, failed).
+    """
+    budget = PixelBudget(budget_pixels)
+    stages = [
+        ('decode', lambda item: decode_image(item[1])),
+        ('convert', lambda item: prepare_image(item[1], settings)),
+        ('encode', lambda item: encode_image(item[1], item[0], settings)),
+    ]
+    queues = [queue.Queue(maxsize=workers) for _ in range(len(stages) + 1)]
+    done = object()
+
+    def read_stage():
+        try:
+            for heic_file in files:
+                costs = {} if profile else None
+                try:
+                    outputs = passthrough_jpeg(heic_file, settings)
+                    if outputs:
+                        queues[-1].put((heic_file, outputs, 0, None, costs))
+                        continue
+                    with measure_stage(costs, 'read'):
+                        img = read_image(heic_file, settings)
+                except Exception as e:
+                    queues[-1].put((heic_file, None, 0, e, costs))
+                    continue
+                pixels = img.width * img.height
+                budget.acquire(pixels)
+                queues[0].put((heic_file, img, pixels, None, costs))
+        finally:
+            for _ in range(workers):
+                queues[0].put(done)
+
+    def run_stage(index, remaining):
+        (name, func), in_q, out_q = stages[index], queues[index], queues[index + 1]
+        while True:
+            item = in_q.get()
+            if item is done:
+                break
+            heic_file, img, pixels, _, costs = item
+            try:
+                with measure_stage(costs, name) as new_images:
+                    result = func(item)
+                    if name != 'encode' and (result is not img or name == 'decode'):
+                        new_images.append(result)
+            except Exception as e:
+                img.close()
+                budget.release(pixels)
+                queues[-1].put((heic_file, None, 0, e, costs))
+                continue
+            if out_q is queues[-1]:
+                # Encoded: the pixels are no longer needed
+                img.close()
+                budget.release(pixels)
+            out_q.put((heic_file, result, pixels, None, costs))
+        # The last worker of a stage to finish tells the next stage
+        with remaining[1]:
+            remaining[0] -= 1
+            if remaining[0] == 0:
+                for _ in range(workers if out_q is not queues[-1] else 1):
+                    out_q.put(done)
+
+    threads = [threading.Thread(target=read_stage, daemon=True)]
+    for index in range(len(stages)):
+        remaining = [workers, threading.Lock()]
+        for _ in range(workers):
+            threads.append(threading.Thread(target=run_stage, args=(index, remaining), daemon=True))
+    for thread in threads:
+        thread.start()
+
+    converted = 0
+    failed = 0
+    while True:
+        item = queues[-1].get()
+        if item is done:
+            break
+        heic_file, outputs, _, error, costs = item
+        if profile:
+            profile.add(heic_file, outputs if error is None else None, costs)
+        if error is None:
+            if outputs == [heic_file]:
+                # Only passthrough_jpeg() leaves a file as its own output
+                report_passthrough(heic_file, outputs)
+            else:
+                print(f"✓ Converted {heic_file} -> {', '.join(outputs)}", flush=True)
+            converted += 1
+            if on_success:
+                on_success(heic_file, outputs)
+        else:
+            print(f"✗ Failed to convert {heic_file}: {str(error)}", flush=True)
+            failed += 1
+    return converted, failed
+
+def _init_worker(profiling=False, watching=False):
+    """Register the HEIF opener in each pool process (needed with spawn)."""
+    pillow_heif.register_heif_opener()
+    # Forked workers inherit the --watch SIGTERM handler; just exit instead
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    if watching:
+        # Ctrl-C reaches the whole process group; the watcher owns shutdown
+        # and lets conversions in progress finish
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if profiling:
+        tracemalloc.start()
+
+def _warm_up():
+    """Import every Pillow plugin so a worker's first real file pays nothing."""
+    Image.init()
+
+def _is_own_output(heic_file, base_counts, output_extensions):
+    """Check whether a scanned file looks like an output of another source.
+
+    Catches outputs that are also valid inputs (IMG.avif next to IMG.heic,
+    IMG-480w.avif for --sizes, or IMG-converted.avif for an AVIF source)
+    before the manifest knows about them.
+    """
+    base, extension = os.path.splitext(heic_file)
+    if extension.lower() not in output_extensions:
         return False
+    source_base = re.sub(r'(-\d+w|' + re.escape(SOURCE_SUFFIX) + ')$', '', base)
+    if source_base != base:
+        return source_base in base_counts
+    return base_counts.get(base, 0) > 1
+
+def skip_own_outputs(files, output_extensions, outputs_written=()):
+    """Lazily drop scanned files that are outputs of another source.
+
+    iter_image_files() yields each directory's files together, so siblings
+    are compared one directory at a time instead of collecting the tree.
+    """
+    for _, group in groupby(files, key=os.path.dirname):
+        group = [f for f in group if os.path.abspath(f) not in outputs_written]
+        base_counts = {}
+        for heic_file in group:
+            base = os.path.splitext(heic_file)[0]
+            base_counts[base] = base_counts.get(base, 0) + 1
+        for heic_file in group:
+            if not _is_own_output(heic_file, base_counts, output_extensions):
+                yield heic_file
+
+def _pool_result(future, heic_file, profile):
+    """Return the outputs of a finished pool task, feeding profile if given."""
+    try:
+        outputs = future.result()
+    except Exception as e:
+        # Worker process died (e.g. killed by the OOM killer)
+        print(f"✗ Failed to convert {heic_file}: {str(e)}", flush=True)
+        outputs = None
+    if profile:
+        outputs, costs = outputs or (None, {})
+        profile.add(heic_file, outputs, costs)
+    return outputs
+
+def convert_files(files, jobs, settings, on_success=None, profile=None):
+    """Convert files across a process pool, returning (converted, failed).
+
+    on_success, if given, is called in this process with each converted
+    file and the list of outputs written for it. With a ConversionProfile,
+    workers also send back per-stage costs for it to collect.
+    """
+    converted = 0
+    failed = 0
+
+    if jobs <= 1:
+        for heic_file in files:
+            if profile:
+                outputs, costs = _convert_profiled(heic_file, settings)
+                profile.add(heic_file, outputs, costs)
+            else:
+                outputs = convert_heic_file(heic_file, settings)
+            if outputs:
+                converted += 1
+                if on_success:
+                    on_success(heic_file, outputs)
+            else:
+                failed += 1
+        return converted, failed
+
+    # Each file is decoded and encoded independently, so hand them out to
+    # worker processes and count results in completion order. Only a few
+    # files per worker are queued at once, so a streamed file list is
+    # consumed as the pool drains instead of being materialised up front.
+    files = iter(files)
+    worker = _convert_profiled if profile else convert_heic_file
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                             initargs=(profile is not None,)) as pool:
+        futures = {}
+        while True:
+            for heic_file in islice(files, 2 * jobs - len(futures)):
+                futures[pool.submit(worker, heic_file, settings)] = heic_file
+            if not futures:
+                break
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                heic_file = futures.pop(future)
+                outputs = _pool_result(future, heic_file, profile)
+                if outputs:
+                    converted += 1
+                    if on_success:
+                        on_success(heic_file, outputs)
+                else:
+                    failed += 1
+    return converted, failed
+
+def _record_watched(manifest, heic_file, settings, outputs):
+    """Record a watched conversion unless its source has vanished meanwhile."""
+    try:
+        record_conversion(manifest, heic_file, settings, outputs)
+    except OSError:
+        # Moved out of the watched folder after converting; nothing to track
+        pass
+
+def watch_directory(root, jobs, settings, manifest, manifest_file,
+                    interval=0.25, settle=0.5, profile=None):
+    """Convert new or changed files under root until interrupted.
+
+    The tree is polled with os.scandir() rather than an OS notification
+    API, so it works the same everywhere. A file is only converted once its
+    size and mtime have held still for settle seconds, which skips files
+    that are still being copied in; a file that fails anyway (say, a copy
+    that stalled) is retried as soon as it changes again. The worker pool
+    is started up front and kept for the whole session, so each file only
+    pays for its own decode and encode.
+    """
+    converted = 0
+    failed = 0
+    seen = {}
+    handled = {}
+    busy = {}
+    # Never treat our own outputs (e.g. .avif) as new inputs
+    outputs_written = {f for entry in manifest.values() for f in entry['outputs']}
+    output_extensions = {OUTPUT_FORMATS[fmt][0] for fmt in output_formats(settings)}
+    worker = _convert_profiled if profile else convert_heic_file
+
+    # Stop the same way on SIGTERM (service managers) as on Ctrl-C
+    def interrupt(signum, frame):
+        raise KeyboardInterrupt
+    signal.signal(signal.SIGTERM, interrupt)
+
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                             initargs=(profile is not None, True)) as pool:
+        wait([pool.submit(_warm_up) for _ in range(jobs)])
+        print(f"Watching {root} using {jobs} job(s), Ctrl-C to stop...", flush=True)
+        try:
+            while True:
+                now = time.monotonic()
+                scanned = skip_own_outputs(iter_image_files(root), output_extensions, outputs_written)
+                current = {}
+                for heic_file in scanned:
+                    try:
+                        st = os.stat(heic_file)
+                    except OSError:
+                        continue
+                    signature = (st.st_size, st.st_mtime_ns)
+                    previous = seen.get(heic_file)
+                    stable_since = previous[1] if previous and previous[0] == signature else now
+                    current[heic_file] = (signature, stable_since)
+                    if (now - stable_since < settle or handled.get(heic_file) == signature
+                            or heic_file in busy.values()):
+                        continue
+                    handled[heic_file] = signature
+                    try:
+                        if is_up_to_date(manifest, heic_file, settings):
+                            continue
+                    except OSError:
+                        # Moved away since the scan; a new copy is a new signature
+                        continue
+                    busy[pool.submit(worker, heic_file, settings)] = heic_file
+                seen = current
+                handled = {f: handled[f] for f in handled if f in seen}
+
+                finished = [future for future in busy if future.done()]
+                for future in finished:
+                    heic_file = busy.pop(future)
+                    outputs = _pool_result(future, heic_file, profile)
+                    if not outputs:
+                        failed += 1
+                        continue
+                    converted += 1
+                    outputs_written.update(os.path.abspath(f) for f in outputs)
+                    _record_watched(manifest, heic_file, settings, outputs)
+                if finished:
+                    save_manifest(manifest_file, manifest)
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            print("\nStopping, waiting for conversions in progress...", flush=True)
+            for future in busy:
+                future.cancel()
+            # Workers ignore the interrupt, so conversions already running
+            # finish and are recorded; queued ones were cancelled above
+            for future, heic_file in busy.items():
+                if not future.cancelled():
+                    outputs = _pool_result(future, heic_file, profile)
+                    if outputs:
+                        converted += 1
+                        _record_watched(manifest, heic_file, settings, outputs)
+                    else:
+                        failed += 1
+            save_manifest(manifest_file, manifest)
+    return converted, failed
 
 def main():
     parser = argparse.ArgumentParser(
@@ -41,43 +1216,315 @@ def main():
   %(prog)s image.HEIC                    # Convert single file
   %(prog)s *.HEIC                       # Convert all HEIC files in current dir
   %(prog)s file1.HEIC file2.HEIC        # Convert specific files
+  %(prog)s -j 4 *.HEIC                  # Convert using 4 worker processes
+  %(prog)s --incremental *.HEIC         # Skip files whose JPEG is current
+  %(prog)s --recursive ~/Photos         # Convert a whole tree, streaming paths
+  %(prog)s --memory-budget 200 *.HEIC   # Cap decoded images at 200 MP in flight
+  %(prog)s --sizes 480,960,1920 *.HEIC  # Write responsive width variants
+  %(prog)s --max-bytes 200k *.HEIC      # Best JPEG quality within 200 kB
+  %(prog)s -f avif -f webp -f jpeg *.HEIC  # Modern formats plus a JPEG fallback
+  %(prog)s --max-size 320 *.HEIC        # Fast previews from embedded thumbnails
+  %(prog)s --trace t.jsonl *.HEIC       # Per-stage timings, summary at the end
+  %(prog)s --watch .                    # Stay resident, convert new arrivals
+  %(prog)s --strip gps *.HEIC           # Keep EXIF/XMP/ICC but drop location
+  %(prog)s --resume -r ~/Photos         # Pick up an interrupted batch where it stopped
+
+JPEG inputs that need no resizing, stripping or other formats are copied
+through unchanged instead of being re-encoded.
         """
     )
     
     parser.add_argument(
         'files',
-        nargs='+',
+        nargs='*',
         help='HEIC files to convert'
     )
     
+    parser.add_argument(
+        '-r', '--recursive',
+        metavar='DIR',
+        help='Convert every .heic/.heif/.avif file under DIR'
+    )
+    
+    parser.add_argument(
+        '-j', '--jobs',
+        type=int,
+        default=os.cpu_count() or 1,
+        help='Number of files to convert in parallel (default: CPU count)'
+    )
+    
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help='Skip files already converted with the same settings'
+    )
+    
+    parser.add_argument(
+        '--manifest',
+        default=DEFAULT_MANIFEST,
+        help=f'Manifest used by --incremental (default: {DEFAULT_MANIFEST})'
+    )
+    
+    parser.add_argument(
+        '--journal',
+        metavar='FILE',
+        help='Log each finished file to FILE as it completes (default with '
+             f'--resume: {DEFAULT_JOURNAL})'
+    )
+    
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='Skip files the journal records as finished with the same '
+             'settings, and keep appending to it'
+    )
+    
+    parser.add_argument(
+        '--memory-budget',
+        type=float,
+        metavar='MP',
+        help='Convert in one process through a staged pipeline, keeping at '
+             'most MP megapixels of decoded images in memory at once'
+    )
+    
+    parser.add_argument(
+        '--max-size',
+        type=int,
+        metavar='PX',
+        help='Preview mode: scale output to fit PX x PX, decoding an embedded '
+             'HEIF thumbnail (or a reduced JPEG) when one is large enough'
+    )
+    
+    parser.add_argument(
+        '--sizes',
+        type=parse_sizes,
+        metavar='W1,W2,...',
+        help='Write a JPEG per width (e.g. IMG-480w.jpg) from a single decode, '
+             'plus an IMG.variants.json sidecar with dimensions and byte sizes'
+    )
+    
+    parser.add_argument(
+        '-f', '--format',
+        dest='formats',
+        action='append',
+        choices=sorted(OUTPUT_FORMATS),
+        help='Output format; repeat for several (default: jpeg)'
+    )
+    
+    parser.add_argument(
+        '--jpeg-quality',
+        type=int,
+        default=JPEG_SETTINGS['quality'],
+        help='JPEG quality, 0-100 (default: %(default)s)'
+    )
+    
+    parser.add_argument(
+        '--webp-quality',
+        type=int,
+        default=80,
+        help='WebP quality, 0-100 (default: %(default)s)'
+    )
+    
+    parser.add_argument(
+        '--webp-method',
+        type=int,
+        default=4,
+        choices=range(7),
+        metavar='0-6',
+        help='WebP effort, 0 (fast) to 6 (smallest) (default: %(default)s)'
+    )
+    
+    parser.add_argument(
+        '--avif-quality',
+        type=int,
+        default=75,
+        help='AVIF quality, 0-100 (default: %(default)s)'
+    )
+    
+    parser.add_argument(
+        '--avif-speed',
+        type=int,
+        default=6,
+        choices=range(11),
+        metavar='0-10',
+        help='AVIF encoder speed, 0 (slowest, smallest) to 10 (default: %(default)s)'
+    )
+    
+    parser.add_argument(
+        '--max-bytes',
+        type=parse_bytes,
+        metavar='SIZE',
+        help='Search for the highest quality whose output fits in SIZE '
+             'bytes (k/M suffixes allowed, e.g. 200k)'
+    )
+    
+    parser.add_argument(
+        '--min-ssim',
+        type=float,
+        metavar='SSIM',
+        help='Search for the lowest quality whose SSIM against the '
+             'decoded source stays at or above SSIM (e.g. 0.98)'
+    )
+    
+    parser.add_argument(
+        '--strip',
+        choices=['gps', 'all'],
+        help='EXIF, XMP and ICC metadata is carried into the output; drop '
+             'the GPS location or all of it'
+    )
+    
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='Record wall time, CPU time and allocations per stage and print '
+             'p50/p95/max at the end (with --memory-budget, allocations count '
+             'image buffers only)'
+    )
+    
+    parser.add_argument(
+        '--trace',
+        metavar='FILE',
+        help='Stream one JSON record per file with its stage costs to FILE '
+             '(implies --profile)'
+    )
+    
+    parser.add_argument(
+        '--watch',
+        metavar='DIR',
+        help='Stay running and convert new or changed files under DIR as '
+             'they arrive (implies --incremental)'
+    )
+    
+    parser.add_argument(
+        '--settle',
+        type=float,
+        default=0.5,
+        metavar='SECONDS',
+        help='With --watch, how long a file must stay unchanged before it is '
+             'converted (default: %(default)s)'
+    )
+    
+    parser.add_argument(
+        '--poll-interval',
+        type=float,
+        default=0.25,
+        metavar='SECONDS',
+        help='With --watch, how often DIR is rescanned (default: %(default)s)'
+    )
+    
     args = parser.parse_args()
     
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if args.max_size is not None and args.max_size < 1:
+        parser.error("--max-size must be positive")
+    if args.min_ssim is not None and not 0 < args.min_ssim <= 1:
+        parser.error("--min-ssim must be between 0 and 1")
+    if args.memory_budget is not None and args.memory_budget <= 0:
+        parser.error("--memory-budget must be positive")
+    if args.watch:
+        if args.files or args.recursive or args.memory_budget or args.journal or args.resume:
+            parser.error("--watch cannot be combined with files, --recursive, "
+                         "--memory-budget or --journal/--resume")
+        if not os.path.isdir(args.watch):
+            parser.error(f"not a directory: {args.watch}")
+        if args.settle < 0 or args.poll_interval <= 0:
+            parser.error("--settle and --poll-interval must be positive")
+    elif not args.files and not args.recursive:
+        parser.error("give files to convert, --recursive DIR or --watch DIR")
+    if args.recursive and not os.path.isdir(args.recursive):
+        parser.error(f"not a directory: {args.recursive}")
+    
     # Register HEIF opener with Pillow
     pillow_heif.register_heif_opener()
     
-    # Filter out non-existent files and warn about them
-    existing_files = []
-    for file in args.files:
-        if os.path.exists(file):
-            existing_files.append(file)
-        else:
-            print(f"Warning: File not found: {file}", file=sys.stderr)
+    settings = build_settings(args)
+    profile = None
+    if args.profile or args.trace:
+        profile = ConversionProfile(args.trace)
+        # tracemalloc's peak is process-wide, so the --memory-budget stage
+        # threads would reset each other's; they report image buffers only
+        if not args.memory_budget:
+            tracemalloc.start()
     
-    if not existing_files:
-        print("Error: No valid files to convert", file=sys.stderr)
-        sys.exit(1)
+    if args.watch:
+        manifest = load_manifest(args.manifest)
+        try:
+            converted, failed = watch_directory(args.watch, args.jobs, settings, manifest,
+                                                args.manifest, args.poll_interval,
+                                                args.settle, profile)
+        finally:
+            if profile:
+                profile.close()
+        if profile:
+            profile.print_summary()
+        print(f"\nWatch stopped: {converted} successful, {failed} failed")
+        return
     
-    print(f"Converting {len(existing_files)} file(s)...")
+    if args.incremental:
+        manifest = load_manifest(args.manifest)
     
-    converted = 0
-    failed = 0
+    if args.recursive:
+        # Paths are streamed, so conversion starts with the first file found.
+        # Earlier runs' outputs that are also inputs (IMG.avif, IMG-480w.avif
+        # next to IMG.heic) are skipped whichever formats this run writes.
+        outputs_written = ({f for entry in manifest.values() for f in entry['outputs']}
+                           if args.incremental else set())
+        output_extensions = {extension for extension, _, _ in OUTPUT_FORMATS.values()}
+        files = skip_own_outputs(iter_image_files(args.recursive), output_extensions, outputs_written)
+        jobs = args.jobs
+        print(f"Converting files under {args.recursive} using {jobs} job(s)...")
+    else:
+        # Filter out non-existent files and warn about them
+        files = []
+        for file in args.files:
+            if os.path.exists(file):
+                files.append(file)
+            else:
+                print(f"Warning: File not found: {file}", file=sys.stderr)
+        
+        if not files:
+            print("Error: No valid files to convert", file=sys.stderr)
+            sys.exit(1)
+        
+        jobs = min(args.jobs, len(files))
+        print(f"Converting {len(files)} file(s) using {jobs} job(s)...")
     
-    for heic_file in existing_files:
-        if convert_heic_file(heic_file):
-            converted += 1
+    stats = {'skipped': 0}
+    if args.incremental:
+        files = pending_files(files, manifest, settings, stats)
+    journal = None
+    if args.journal or args.resume:
+        journal = Journal(args.journal or DEFAULT_JOURNAL, settings, args.resume)
+        if args.resume:
+            files = journal.pending(files, stats)
+    
+    def on_success(heic_file, outputs):
+        if args.incremental:
+            record_conversion(manifest, heic_file, settings, outputs)
+        if journal:
+            journal.record(heic_file, outputs)
+    
+    try:
+        if args.memory_budget:
+            budget_pixels = int(args.memory_budget * 1000000)
+            converted, failed = convert_pipeline(files, jobs, budget_pixels, settings, on_success, profile)
         else:
-            failed += 1
+            converted, failed = convert_files(files, jobs, settings, on_success, profile)
+    finally:
+        # Keep whatever finished, even if the batch was interrupted
+        if args.incremental:
+            save_manifest(args.manifest, manifest)
+        if journal:
+            journal.close()
+        if profile:
+            profile.close()
+    
+    if profile:
+        profile.print_summary()
     
+    if stats['skipped']:
+        print(f"Skipped {stats['skipped']} up-to-date file(s)")
     print(f"\nConversion complete: {converted} successful, {failed} failed")
     
     # Exit with error code if any conversions failed
@@ -19,10 +19,13 @@ from .heif import (
     HeifFile,
     HeifImage,
     encode,
+    encode_batch,
     from_bytes,
     from_pillow,
     is_supported,
+    iter_heif,
     open_heif,
     read_heif,
 )
 from .misc import get_file_mimetype, load_libheif_plugin, set_orientation
+from .probe import probe_heif, probe_heif_batch
@@ -59,8 +59,16 @@ class _LibHeifImageFile(ImageFile.ImageFile):
             try:
                 data = frame_heif.data  # Size of Image can change during decoding
                 self._size = frame_heif.size  # noqa
-                self.load_prepare()
-                self.frombytes(data, "raw", (frame_heif.mode, frame_heif.stride))
+                if frame_heif.mode in Image._MAPMODES and frame_heif.mode == self.mode:  # noqa
+                    # Pillow can use the decoded buffer as image memory as is: wrap it instead of copying.
+                    # The image becomes read-only; Pillow copies it on first write.
+                    self.im = Image.core.map_buffer(data, self._size, "raw", 0, (self.mode, frame_heif.stride, 1))
+                    self.readonly = 1
+                    # `data` does not own its memory, the decoded frame does: keep it alive with the image.
+                    self._heif_buffer_owner = frame_heif
+                else:
+                    self.load_prepare()
+                    self.frombytes(data, "raw", (frame_heif.mode, frame_heif.stride))
             except EOFError:
                 if not ImageFile.LOAD_TRUNCATED_IMAGES:
                     raise
@@ -173,6 +181,10 @@ def __options_update(**kwargs):
             options.SAVE_HDR_TO_12_BIT = v
         elif k == "decode_threads":
             options.DECODE_THREADS = v
+        elif k == "decode_concurrency":
+            options.DECODE_CONCURRENCY = v
+        elif k == "decode_threads_limit":
+            options.DECODE_THREADS_LIMIT = v
         elif k == "allow_incorrect_headers":
             options.ALLOW_INCORRECT_HEADERS = v
         elif k == "save_nclx_profile":
@@ -4,6 +4,8 @@ from __future__ import annotations
 
 from copy import copy, deepcopy
 from io import SEEK_SET
+from collections.abc import Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from typing import Any
 
 from PIL import Image
@@ -11,11 +13,13 @@ from PIL import Image
 from . import options
 from .constants import HeifCompressionFormat
 from .misc import (
+    DECODE_THREADS_LIMITER,
     MODE_INFO,
     CtxEncode,
     MimCImage,
     _exif_from_pillow,
     _get_bytes,
+    _get_decode_threads,
     _get_heif_meta,
     _get_orientation_for_encoder,
     _get_primary_index,
@@ -49,6 +53,8 @@ class BaseImage:
 
     For currently supported modes by Pillow-Heif see :ref:`image-modes`."""
 
+    _decode_threads: int = 1
+
     def __init__(self, c_image):
         self.size, self.mode = c_image.size_mode
         self._c_image = c_image
@@ -92,17 +98,26 @@ class BaseImage:
     def to_pillow(self) -> Image.Image:
         """Helper method to create :external:py:class:`~PIL.Image.Image` class.
 
+        .. note:: For modes Pillow can map directly (``L``, ``RGBA``, ``I;16``...) the returned image shares
+            memory with the decoded data and is read-only until first modified, when Pillow copies it.
+            Other modes (``RGB`` stored as 4 bytes per pixel by Pillow) are copied.
+
         :returns: :external:py:class:`~PIL.Image.Image` class created from an image.
         """
         self.load()
-        return Image.frombytes(
+        image = Image.frombuffer(
             self.mode,  # noqa
             self.size,
             self.data,
             "raw",
             self.mode,
             self.stride,
+            1,
         )
+        if image.readonly:
+            # `data` does not own its memory, this object does: keep it alive with the image.
+            image._heif_buffer_owner = self  # noqa pylint: disable=protected-access
+        return image
 
     def load(self) -> None:
         """Method to decode image.
@@ -111,7 +126,8 @@ class BaseImage:
             when reading `data` or `stride` property of image will be loaded automatically.
         """
         if not self._data:
-            self._data = self._c_image.data
+            with DECODE_THREADS_LIMITER.reserve(self._decode_threads):
+                self._data = self._c_image.data
             self.size, _ = self._c_image.size_mode
 
 
@@ -259,9 +275,13 @@ class HeifFile:
                 preferred_decoder = options.PREFERRED_DECODER.get("HEIF", "")
             else:
                 preferred_decoder = ""
+            decode_threads = _get_decode_threads(kwargs.get("decode_threads"))
+            if options.DECODE_THREADS_LIMIT > 0:
+                # libheif must not run more threads than the decode books in the limiter
+                decode_threads = min(decode_threads, options.DECODE_THREADS_LIMIT)
             images = _pillow_heif.load_file(
                 fp_bytes,
-                options.DECODE_THREADS,
+                decode_threads,
                 convert_hdr_to_8bit,
                 bgr_mode,
                 kwargs.get("remove_stride", True),
@@ -272,6 +292,8 @@ class HeifFile:
             )
         self.mimetype = mimetype
         self._images: list[HeifImage] = [HeifImage(i) for i in images if i is not None]
+        for image in self._images:
+            image._decode_threads = decode_threads  # pylint: disable=protected-access
         self.primary_index = 0
         for index, _ in enumerate(self._images):
             if _.info.get("primary", False):
@@ -539,6 +561,9 @@ def open_heif(fp, convert_hdr_to_8bit=True, bgr_mode=False, **kwargs) -> HeifFil
         should be converted to 16-bit mode during decoding. `Has lower priority than convert_hdr_to_8bit`!
         Default = **True**
 
+        **decode_threads** number of threads for decoding this file, or ``"auto"``.
+        Default = :py:attr:`~pillow_heif.options.DECODE_THREADS`
+
     :returns: :py:class:`~pillow_heif.HeifFile` object.
     :exception ValueError: invalid input data.
     :exception EOFError: corrupted image data.
@@ -564,6 +589,9 @@ def read_heif(fp, convert_hdr_to_8bit=True, bgr_mode=False, **kwargs) -> HeifFil
         should be converted to 16-bit mode during decoding. `Has lower priority than convert_hdr_to_8bit`!
         Default = **True**
 
+        **decode_threads** number of threads for decoding this file, or ``"auto"``.
+        Default = :py:attr:`~pillow_heif.options.DECODE_THREADS`
+
     :returns: :py:class:`~pillow_heif.HeifFile` object.
     :exception ValueError: invalid input data.
     :exception EOFError: corrupted image data.
@@ -577,6 +605,42 @@ def read_heif(fp, convert_hdr_to_8bit=True, bgr_mode=False, **kwargs) -> HeifFil
     return ret
 
 
+def iter_heif(
+    fp, step: int = 1, start: int = 0, convert_hdr_to_8bit=True, bgr_mode=False, **kwargs
+) -> Iterator[HeifImage]:
+    """Opens the given HEIF image file and decodes its images one at a time, in file order.
+
+    Each image is decoded only when the iterator reaches it, and the iterator drops its reference to it
+    before decoding the next one. Memory does not grow with the length of the sequence: in a ``for`` loop
+    it holds the image being decoded plus the one the loop variable still refers to, as long as the caller
+    does not keep the images it received. Images skipped by ``start`` and ``step`` are never decoded.
+
+    :param fp: See parameter ``fp`` in :func:`is_supported`
+    :param step: Decode every ``step``-th image, ``1`` decodes all of them.
+    :param start: Index of the first image to decode.
+    :param convert_hdr_to_8bit: See parameter ``convert_hdr_to_8bit`` in :func:`open_heif`
+    :param bgr_mode: See parameter ``bgr_mode`` in :func:`open_heif`
+    :param kwargs: See parameter ``kwargs`` in :func:`open_heif`
+
+    :returns: iterator of decoded :py:class:`~pillow_heif.HeifImage` objects.
+    :exception ValueError: invalid input data or ``step`` is less than 1.
+    :exception EOFError: corrupted image data.
+    :exception SyntaxError: unsupported feature.
+    :exception RuntimeError: some other error.
+    :exception OSError: out of memory.
+    """
+    if step < 1:
+        raise ValueError("step must be a positive integer")
+    heif_file = HeifFile(fp, convert_hdr_to_8bit, bgr_mode, **kwargs)
+    frames = heif_file._images[start::step]  # pylint: disable=protected-access
+    del heif_file
+    frames.reverse()
+    while frames:
+        image = frames.pop()
+        image.load()
+        yield image
+
+
 def encode(mode: str, size: tuple[int, int], data, fp, **kwargs) -> None:
     """Encodes data in a ``fp``.
 
@@ -588,6 +652,67 @@ def encode(mode: str, size: tuple[int, int], data, fp, **kwargs) -> None:
     _encode_images([HeifImage(MimCImage(mode, size, data, **kwargs))], fp, **kwargs)
 
 
+def encode_batch(
+    jobs: Iterable[tuple[Any, Any, dict[str, Any]]], max_workers: int | None = None, ordered: bool = True
+) -> Iterator[tuple[int, Any, Exception | None]]:
+    """Encodes many images at the same time across a pool of threads.
+
+    The encoders release the GIL while they work, so the speedup is close to linear in the number of CPU cores.
+    Jobs are consumed lazily and only a few of them per thread are in flight, so long batches can be streamed
+    through without holding all of the images in memory.
+
+    :param jobs: An iterable of ``(image, fp, params)`` tuples. ``image`` is a Pillow
+        :external:py:class:`~PIL.Image.Image`, a :py:class:`~pillow_heif.HeifFile` or
+        a :py:class:`~pillow_heif.HeifImage`, ``fp`` is where to save it and ``params`` are the keyword options
+        of :py:meth:`~pillow_heif.HeifFile.save`, e.g. ``{"format": "AVIF", "quality": 60}``.
+    :param max_workers: Number of threads. Default: same as :py:class:`concurrent.futures.ThreadPoolExecutor`.
+    :param ordered: Yield results in the order of ``jobs``. With ``False`` they are yielded as soon as
+        each encode finishes.
+
+    :returns: an iterator of ``(index, fp, error)`` tuples, where ``index`` is the position of the job in ``jobs``
+        and ``error`` is the exception that the encode raised or ``None``.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        window = executor._max_workers * 4  # pylint: disable=protected-access
+        pending: list = []
+        for index, (image, fp, params) in enumerate(jobs):
+            pending.append(executor.submit(_encode_job, index, image, fp, params))
+            if len(pending) < window:
+                continue
+            if ordered:
+                yield pending.pop(0).result()
+            else:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.remove(future)
+                    yield future.result()
+        if ordered:
+            for future in pending:
+                yield future.result()
+        else:
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.remove(future)
+                    yield future.result()
+
+
+def _encode_job(index: int, image, fp, params: dict[str, Any]) -> tuple[int, Any, Exception | None]:
+    try:
+        if isinstance(image, Image.Image):
+            image = from_pillow(image)
+        if isinstance(image, HeifImage):
+            images = [image]
+        elif isinstance(image, HeifFile):
+            images = image._images  # pylint: disable=protected-access
+        else:
+            raise TypeError(f"Cannot encode {type(image).__name__}, expected Image, HeifFile or HeifImage.")
+        _encode_images(images, fp, **params)
+    except Exception as e:  # noqa # pylint: disable=broad-except
+        return index, fp, e
+    return index, fp, None
+
+
 def _encode_images(images: list[HeifImage], fp, **kwargs) -> None:
     compression = kwargs.get("format", "HEIF")
     compression_format = HeifCompressionFormat.AV1 if compression == "AVIF" else HeifCompressionFormat.HEVC
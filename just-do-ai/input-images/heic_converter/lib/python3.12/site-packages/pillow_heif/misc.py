@@ -6,7 +6,10 @@ Mostly for internal use, so prototypes can change between versions.
 from __future__ import annotations
 
 import builtins
+import os
 import re
+import threading
+from contextlib import contextmanager
 from dataclasses import dataclass
 from enum import IntEnum
 from math import ceil
@@ -203,6 +206,49 @@ def get_file_mimetype(fp) -> str:
     return ""
 
 
+def _get_decode_threads(decode_threads: int | str | None = None) -> int:
+    """Resolves the number of decode threads for one file: per-call value, ``"auto"`` or the global option."""
+    if decode_threads is None:
+        decode_threads = options.DECODE_THREADS
+    if decode_threads != "auto":
+        return int(decode_threads)
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # not available on macOS and Windows
+        cpus = os.cpu_count() or 1
+    return max(1, cpus // max(1, options.DECODE_CONCURRENCY))
+
+
+class _DecodeThreadsLimiter:
+    """Keeps the threads of all running decodes within ``options.DECODE_THREADS_LIMIT``."""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._in_use = 0
+
+    @contextmanager
+    def reserve(self, threads: int):
+        """Waits until ``threads`` decode threads fit in the limit and holds them for the block."""
+        limit = options.DECODE_THREADS_LIMIT
+        if limit <= 0:
+            yield
+            return
+        # HeifFile already clamps to the limit; this only matters if the limit was lowered after opening
+        threads = max(1, min(threads, limit))
+        with self._condition:
+            self._condition.wait_for(lambda: self._in_use + threads <= limit)
+            self._in_use += threads
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._in_use -= threads
+                self._condition.notify_all()
+
+
+DECODE_THREADS_LIMITER = _DecodeThreadsLimiter()
+
+
 def _get_bytes(fp, length=None) -> bytes:
     if isinstance(fp, (str, Path)):
         with builtins.open(fp, "rb") as file:
@@ -213,7 +259,11 @@ def _get_bytes(fp, length=None) -> bytes:
         if offset is not None and hasattr(fp, "seek"):
             fp.seek(offset)
         return result
-    return bytes(fp)[:length]
+    if isinstance(fp, bytes):
+        return fp[:length]  # no copy when the whole object is requested
+    # Other buffers (bytearray, memoryview...): slice before copying, so header checks
+    # like `get_file_mimetype` do not duplicate the whole file.
+    return bytes(memoryview(fp)[:length])
 
 
 def _retrieve_exif(metadata: list[dict]) -> bytes | None:
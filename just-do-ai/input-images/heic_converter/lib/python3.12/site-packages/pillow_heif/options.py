@@ -3,9 +3,31 @@
 DECODE_THREADS = 4
 """Maximum number of threads to use for decoding images(when it is possible)
 
+Set to ``"auto"`` to split the available CPUs between the decodes running at the same time,
+see :py:attr:`DECODE_CONCURRENCY`.
+
+.. note:: ``decode_threads`` passed to ``open_heif``, ``read_heif`` or ``HeifFile`` has higher priority than this.
+
 When use pillow_heif as a plugin you can set it with: `register_*_opener(decode_threads=8)`"""
 
 
+DECODE_CONCURRENCY = 1
+"""How many images the application decodes at the same time, across all its processes and threads.
+
+Used by ``"auto"`` decode threads: each decode gets the available CPUs divided by this value (at least one).
+Set it to the size of your worker pool.
+
+When use pillow_heif as a plugin you can set it with: `register_*_opener(decode_concurrency=8)`"""
+
+
+DECODE_THREADS_LIMIT = 0
+"""Limit for the threads used by all decodes running at the same time in this process, ``0`` for no limit.
+
+A decode that would go over the limit waits until running decodes release enough threads.
+
+When use pillow_heif as a plugin you can set it with: `register_*_opener(decode_threads_limit=8)`"""
+
+
 THUMBNAILS = True
 """Option to enable/disable thumbnail support
 
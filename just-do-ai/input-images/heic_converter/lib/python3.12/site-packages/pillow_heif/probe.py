@@ -0,0 +1,372 @@
+"""Header-only inspection of HEIF/AVIF files without libheif.
+
+Only the container boxes (``ftyp`` and ``meta``) and the EXIF item are read, so probing a file
+costs a few kilobytes of I/O and no decoder setup.
+"""
+
+from __future__ import annotations
+
+import builtins
+import math
+from concurrent.futures import ThreadPoolExecutor
+from fractions import Fraction
+from io import SEEK_SET
+from pathlib import Path
+from struct import unpack_from
+from typing import Any, Iterable, Iterator
+
+from PIL import Image
+
+from .misc import get_file_mimetype
+
+_IMAGE_ITEM_TYPES = (b"hvc1", b"av01", b"grid", b"iden", b"iovl", b"jpeg", b"j2k1", b"vvc1", b"unci")
+_ALPHA_AUX_TYPES = ("urn:mpeg:hevc:2015:auxid:1", "urn:mpeg:mpegB:cicp:systems:auxiliary:alpha")
+_EXIF_TIMESTAMPS = {
+    0x0132: "datetime",
+    0x9003: "datetime_original",
+    0x9004: "datetime_digitized",
+    0x9011: "offset_time_original",
+}
+_MAX_META_SIZE = 64 * 1024 * 1024
+
+
+def _iter_boxes(data, start: int, end: int) -> Iterator[tuple[bytes, int, int]]:
+    """Yields ``(type, payload_start, box_end)`` for the boxes in ``data[start:end]``."""
+    offset = start
+    while offset + 8 <= end:
+        size, box_type = unpack_from(">I4s", data, offset)
+        header = 8
+        if size == 1:
+            (size,) = unpack_from(">Q", data, offset + 8)
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header or offset + size > end:
+            return
+        yield box_type, offset + header, offset + size
+        offset += size
+
+
+def _read_uint(data, offset: int, size: int) -> int:
+    return int.from_bytes(data[offset : offset + size], "big") if size else 0
+
+
+def _read_top_level(fp) -> tuple[bytes, bytes]:
+    """Reads the start of the ``ftyp`` box and the whole ``meta`` box, seeking over everything else."""
+    fp.seek(0, SEEK_SET)
+    ftyp = fp.read(16)
+    if len(ftyp) < 12 or ftyp[4:8] != b"ftyp":
+        raise ValueError("Invalid input: No 'ftyp' box")
+    offset = 0
+    while True:
+        fp.seek(offset, SEEK_SET)
+        header = fp.read(16)
+        if len(header) < 8:
+            raise ValueError("Invalid input: No 'meta' box")
+        size, box_type = unpack_from(">I4s", header)
+        header_size = 8
+        if size == 1 and len(header) == 16:
+            (size,) = unpack_from(">Q", header, 8)
+            header_size = 16
+        if box_type == b"meta":
+            if size > _MAX_META_SIZE:
+                raise ValueError("Invalid input: 'meta' box too large")
+            fp.seek(offset + header_size, SEEK_SET)
+            return ftyp, fp.read(size - header_size) if size else fp.read()
+        if size < header_size:
+            raise ValueError("Invalid input: No 'meta' box")
+        offset += size
+
+
+def _parse_meta(meta: bytes) -> dict[str, Any]:  # noqa: C901 pylint: disable=too-many-locals,too-many-branches
+    """Parses the item, reference, property and location boxes of a ``meta`` payload."""
+    items: dict[int, dict[str, Any]] = {}
+    refs: dict[bytes, list[tuple[int, list[int]]]] = {}
+    properties: list[tuple[bytes, bytes]] = []
+    associations: dict[int, list[int]] = {}
+    primary = None
+    idat = b""
+    # `meta` is a full box: skip version and flags
+    for box_type, start, end in _iter_boxes(meta, 4, len(meta)):
+        version = meta[start]
+        body = start + 4
+        if box_type == b"pitm":
+            primary = _read_uint(meta, body, 2 if version == 0 else 4)
+        elif box_type == b"iinf":
+            entries = body + (2 if version == 0 else 4)
+            for infe_type, infe_start, _ in _iter_boxes(meta, entries, end):
+                infe_version = meta[infe_start]
+                if infe_type != b"infe" or infe_version < 2:
+                    continue
+                id_size = 2 if infe_version == 2 else 4
+                item_id = _read_uint(meta, infe_start + 4, id_size)
+                item_type = meta[infe_start + 6 + id_size : infe_start + 10 + id_size]
+                hidden = bool(_read_uint(meta, infe_start + 1, 3) & 1)
+                items.setdefault(item_id, {}).update(type=item_type, hidden=hidden)
+        elif box_type == b"iref":
+            id_size = 2 if version == 0 else 4
+            for ref_type, ref_start, _ in _iter_boxes(meta, body, end):
+                from_id = _read_uint(meta, ref_start, id_size)
+                count = _read_uint(meta, ref_start + id_size, 2)
+                to_start = ref_start + id_size + 2
+                to_ids = [_read_uint(meta, to_start + i * id_size, id_size) for i in range(count)]
+                refs.setdefault(ref_type, []).append((from_id, to_ids))
+        elif box_type == b"iprp":
+            for child_type, child_start, child_end in _iter_boxes(meta, start, end):
+                if child_type == b"ipco":
+                    for prop_type, prop_start, prop_end in _iter_boxes(meta, child_start, child_end):
+                        properties.append((prop_type, meta[prop_start:prop_end]))
+                elif child_type == b"ipma":
+                    ipma_version, ipma_flags = meta[child_start], _read_uint(meta, child_start + 1, 3)
+                    pos = child_start + 4
+                    count = _read_uint(meta, pos, 4)
+                    pos += 4
+                    for _ in range(count):
+                        id_size = 2 if ipma_version < 1 else 4
+                        item_id = _read_uint(meta, pos, id_size)
+                        pos += id_size
+                        n = meta[pos]
+                        pos += 1
+                        indexes = []
+                        for _ in range(n):
+                            if ipma_flags & 1:
+                                indexes.append(_read_uint(meta, pos, 2) & 0x7FFF)
+                                pos += 2
+                            else:
+                                indexes.append(meta[pos] & 0x7F)
+                                pos += 1
+                        associations[item_id] = indexes
+        elif box_type == b"iloc":
+            offset_size, length_size = meta[body] >> 4, meta[body] & 15
+            base_offset_size, index_size = meta[body + 1] >> 4, meta[body + 1] & 15
+            pos = body + 2
+            count_size = 2 if version < 2 else 4
+            count = _read_uint(meta, pos, count_size)
+            pos += count_size
+            for _ in range(count):
+                item_id = _read_uint(meta, pos, 2 if version < 2 else 4)
+                pos += 2 if version < 2 else 4
+                construction = 0
+                if version in (1, 2):
+                    construction = _read_uint(meta, pos, 2) & 15
+                    pos += 2
+                pos += 2  # data_reference_index
+                base_offset = _read_uint(meta, pos, base_offset_size)
+                pos += base_offset_size
+                extent_count = _read_uint(meta, pos, 2)
+                pos += 2
+                extents = []
+                for _ in range(extent_count):
+                    if version in (1, 2):
+                        pos += index_size
+                    extent_offset = _read_uint(meta, pos, offset_size)
+                    pos += offset_size
+                    extent_length = _read_uint(meta, pos, length_size)
+                    pos += length_size
+                    extents.append((base_offset + extent_offset, extent_length))
+                items.setdefault(item_id, {"type": b"", "hidden": False})["location"] = (construction, extents)
+        elif box_type == b"idat":
+            idat = meta[start:end]
+    return {
+        "items": items,
+        "refs": refs,
+        "properties": properties,
+        "associations": associations,
+        "primary": primary,
+        "idat": idat,
+    }
+
+
+def _item_properties(parsed: dict[str, Any], item_id: int) -> dict[bytes, bytes]:
+    """Returns ``{property type: payload}`` for the properties associated with an item."""
+    result = {}
+    for index in parsed["associations"].get(item_id, []):
+        if 0 < index <= len(parsed["properties"]):
+            prop_type, payload = parsed["properties"][index - 1]
+            result.setdefault(prop_type, payload)
+    return result
+
+
+def _crop_extent(extent: Fraction, size: int, offset: Fraction) -> int:
+    """Returns the number of pixels a clean aperture keeps along one axis, rounded and clamped as libheif does."""
+    left = math.floor(offset + Fraction(size - 1, 2) - (extent - 1) / 2)
+    right = math.floor(extent - 1 + left + Fraction(1, 2))
+    left, right = max(left, 0), min(right, size - 1)
+    return right - left + 1 if right >= left else size
+
+
+def _image_size(parsed: dict[str, Any], item_id: int) -> tuple[int, int]:
+    """Returns the size of an item after applying its ``clap`` and ``irot`` properties in ``ipma`` order."""
+    ordered = [
+        parsed["properties"][index - 1]
+        for index in parsed["associations"].get(item_id, [])
+        if 0 < index <= len(parsed["properties"])
+    ]
+    ispe = next((payload for prop_type, payload in ordered if prop_type == b"ispe"), b"")
+    width, height = unpack_from(">II", ispe, 4) if len(ispe) >= 12 else (0, 0)
+    for prop_type, payload in ordered:
+        if prop_type == b"clap" and len(payload) >= 32:
+            width_n, width_d, height_n, height_d, h_off_n, h_off_d, v_off_n, v_off_d = unpack_from(">IIIIiIiI", payload)
+            if width_d and height_d and h_off_d and v_off_d:
+                width, height = (
+                    _crop_extent(Fraction(width_n, width_d), width, Fraction(h_off_n, h_off_d)),
+                    _crop_extent(Fraction(height_n, height_d), height, Fraction(v_off_n, v_off_d)),
+                )
+        elif prop_type == b"irot" and payload and payload[0] & 1:
+            width, height = height, width
+    return width, height
+
+
+def _bit_depth_and_channels(props: dict[bytes, bytes]) -> tuple[int, int]:
+    """Returns ``(bits per channel, number of colour channels)`` from ``pixi`` or the codec configuration."""
+    pixi = props.get(b"pixi")
+    if pixi and len(pixi) > 5:
+        return pixi[5], pixi[4]
+    hvcc = props.get(b"hvcC")
+    if hvcc and len(hvcc) > 18:
+        return (hvcc[18] & 7) + 8, 1 if hvcc[16] & 3 == 0 else 3
+    av1c = props.get(b"av1C")
+    if av1c and len(av1c) > 2:
+        bits = 12 if av1c[2] & 0x20 else 10 if av1c[2] & 0x40 else 8
+        return bits, 1 if av1c[2] & 0x10 else 3
+    return 8, 3
+
+
+def _read_item(fp, parsed: dict[str, Any], item_id: int) -> bytes:
+    construction, extents = parsed["items"][item_id].get("location", (0, []))
+    chunks = []
+    for offset, length in extents:
+        if construction == 1:
+            chunks.append(parsed["idat"][offset : offset + length])
+        elif construction == 0:
+            fp.seek(offset, SEEK_SET)
+            chunks.append(fp.read(length))
+    return b"".join(chunks)
+
+
+def _exif_info(exif_data: bytes) -> dict[str, Any]:
+    """Extracts the orientation and timestamps from an EXIF item (4-byte offset, then TIFF data)."""
+    if len(exif_data) < 8:
+        return {}
+    skip = int.from_bytes(exif_data[:4], "big") + 4
+    exif = Image.Exif()
+    exif.load(exif_data[skip:] if skip < len(exif_data) else exif_data[4:])
+    result: dict[str, Any] = {"orientation": exif.get(0x0112)}
+    tags = dict(exif)
+    tags.update(exif.get_ifd(0x8769))
+    for tag, key in _EXIF_TIMESTAMPS.items():
+        value = tags.get(tag)
+        if value:
+            result[key] = value.strip("\x00 ") if isinstance(value, str) else value
+    return result
+
+
+def probe_heif(fp) -> dict[str, Any]:  # pylint: disable=too-many-locals
+    """Reads the main properties of a HEIF/AVIF file from its container boxes only.
+
+    Nothing is decoded and libheif is not involved: only the ``ftyp`` and ``meta`` boxes and the
+    EXIF item are read, usually a few kilobytes at the start of the file.
+
+    :param fp: A filename (string), pathlib.Path object or a file object.
+        The file object must implement ``file.read`` and ``file.seek``, and be opened in binary mode.
+
+    :returns: a ``dict`` with ``mimetype``, ``size`` (width and height after the ``clap`` crop and rotation,
+        as reported by :py:class:`~pillow_heif.HeifFile`), ``mode``, ``bit_depth``, ``has_alpha``,
+        ``rotation`` (counter-clockwise degrees from ``irot``), ``mirror`` (``imir`` axis or ``None``),
+        ``orientation`` (EXIF value or ``None``), ``primary_index``, ``image_count``, ``thumbnails``
+        (count for the primary image) and, when the EXIF has them, ``datetime``,
+        ``datetime_original``, ``datetime_digitized`` and ``offset_time_original``.
+
+    :exception ValueError: the container is not a valid HEIF file.
+    """
+    if isinstance(fp, (str, Path)):
+        with builtins.open(fp, "rb") as file:
+            return probe_heif(file)
+    ftyp, meta = _read_top_level(fp)
+    parsed = _parse_meta(meta)
+    items, refs = parsed["items"], parsed["refs"]
+
+    not_top_level = set()
+    thumbnails: dict[int, int] = {}
+    alpha_for = set()
+    for ref_type in (b"thmb", b"auxl"):
+        for from_id, to_ids in refs.get(ref_type, []):
+            not_top_level.add(from_id)
+            if ref_type == b"thmb":
+                for to_id in to_ids:
+                    thumbnails[to_id] = thumbnails.get(to_id, 0) + 1
+            else:
+                aux_c = _item_properties(parsed, from_id).get(b"auxC", b"")
+                if aux_c[4:].split(b"\x00")[0].decode("ascii", "replace") in _ALPHA_AUX_TYPES:
+                    alpha_for.update(to_ids)
+    for _, to_ids in refs.get(b"dimg", []):
+        not_top_level.update(to_ids)
+    top_level = [
+        item_id
+        for item_id in sorted(items)
+        if items[item_id]["type"] in _IMAGE_ITEM_TYPES and not items[item_id]["hidden"] and item_id not in not_top_level
+    ]
+    primary = parsed["primary"]
+    if primary not in items:
+        raise ValueError("Invalid input: No primary item")
+
+    props = _item_properties(parsed, primary)
+    width, height = _image_size(parsed, primary)
+    rotation = (props[b"irot"][0] & 3) * 90 if b"irot" in props else 0
+    bit_depth, channels = _bit_depth_and_channels(props)
+    has_alpha = primary in alpha_for
+    if channels == 1:
+        mode = "L" if bit_depth <= 8 else "I;16"
+    else:
+        mode = "RGBA" if has_alpha else "RGB"
+
+    result: dict[str, Any] = {
+        "mimetype": get_file_mimetype(ftyp),
+        "size": (width, height),
+        "mode": mode,
+        "bit_depth": bit_depth,
+        "has_alpha": has_alpha,
+        "rotation": rotation,
+        "mirror": props[b"imir"][0] & 1 if b"imir" in props else None,
+        "orientation": None,
+        "primary_index": top_level.index(primary) if primary in top_level else 0,
+        "image_count": len(top_level),
+        "thumbnails": thumbnails.get(primary, 0),
+    }
+    for from_id, to_ids in refs.get(b"cdsc", []):
+        if primary in to_ids and items.get(from_id, {}).get("type") == b"Exif":
+            result.update(_exif_info(_read_item(fp, parsed, from_id)))
+            break
+    return result
+
+
+def _probe_path(path) -> dict[str, Any]:
+    try:
+        result = probe_heif(path)
+    except (OSError, ValueError, IndexError) as e:
+        return {"path": path, "error": str(e)}
+    result["path"] = path
+    return result
+
+
+def probe_heif_batch(paths: Iterable, max_workers: int | None = None) -> Iterator[dict[str, Any]]:
+    """Probes many files with :py:func:`probe_heif`, overlapping their I/O across threads.
+
+    Paths are consumed lazily and results are yielded in input order, so tens of thousands of files
+    can be streamed through without holding all of them in memory.
+
+    :param paths: An iterable of filenames (strings) or pathlib.Path objects.
+    :param max_workers: Number of threads. Default: same as :py:class:`concurrent.futures.ThreadPoolExecutor`.
+
+    :returns: an iterator of the :py:func:`probe_heif` dictionaries, each with an extra ``path`` key.
+        Files that cannot be probed give ``{"path": ..., "error": "..."}`` instead of raising.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        window = executor._max_workers * 4  # pylint: disable=protected-access
+        pending: list = []
+        for path in paths:
+            pending.append(executor.submit(_probe_path, path))
+            if len(pending) >= window:
+                yield pending.pop(0).result()
+        for future in pending:
+            yield future.result()